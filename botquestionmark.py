@@ -11,24 +11,33 @@ import json
 import os
 import datetime
 import logging
-import sqlite3
 import time
 import yaml
 import re
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 import wavelink
-import motor.motor_asyncio
+from pymongo.errors import OperationFailure, PyMongoError
+from storage import StorageBackend, create_storage
+from rendering import init_rank_card_worker, generate_level_image, generate_stats_chart
+from matching import search_pattern
 import traceback
 import typing
 from dotenv import load_dotenv
-from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
-import matplotlib.pyplot as plt
 import humanfriendly
 import psutil
 import itertools
+import copy
+import bisect
+import heapq
+import hashlib
+import multiprocessing
 from typing import Optional, List, Dict, Union, Any
-from contextlib import contextmanager
-from collections import defaultdict, Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, Counter, deque, OrderedDict
 from functools import wraps
 
 # Load environment variables
@@ -54,7 +63,55 @@ logging.basicConfig(
 logger = logging.getLogger('DiscordBotPro')
 
 # Initialize Bot
-bot = commands.Bot(command_prefix=commands.when_mentioned_or('!'), intents=intents, case_insensitive=True)
+class DiscordBotPro(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        # Bumped whenever the command set changes; rendered help embeds are keyed on it
+        self.command_version = 0
+        super().__init__(*args, **kwargs)
+    
+    def add_command(self, command):
+        super().add_command(command)
+        self.command_version += 1
+    
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.command_version += 1
+        return command
+    
+    async def setup_hook(self):
+        # One pooled HTTP session for every outbound download the bot makes
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=ASSET_HTTP_CONNECTIONS, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=ASSET_HTTP_TIMEOUT)
+        )
+        # Workers start before the gateway connects, so the first !rank does not pay for it
+        rank_cards.start()
+        regex_matcher.start()
+    
+    async def get_context(self, origin, *, cls=None):
+        # Command replies go through the outbound scheduler's highest priority lane
+        return await super().get_context(origin, cls=cls or ScheduledContext)
+    
+    async def close(self):
+        # Deliver queued moderation logs while the gateway is still up
+        try:
+            await log_dispatcher.close()
+        except Exception as e:
+            logger.error(f"Failed to flush moderation logs on shutdown: {e}")
+        
+        rank_cards.close()
+        regex_matcher.close()
+        if getattr(self, "http_session", None) is not None:
+            await self.http_session.close()
+        
+        # Flush write-behind buffers before the connection goes away
+        try:
+            await db.close()
+        except Exception as e:
+            logger.error(f"Failed to flush database buffers on shutdown: {e}")
+        await super().close()
+
+bot = DiscordBotPro(command_prefix=commands.when_mentioned_or('!'), intents=intents, case_insensitive=True)
 
 # Constants
 EMBED_COLOR = 0x3498db
@@ -64,89 +121,967 @@ WARNING_COLOR = 0xf1c40f
 INFO_COLOR = 0x3498db
 PREMIUM_COLOR = 0x9b59b6
 
-# Database Setup
-class Database:
+# Storage Settings
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')  # mongo or sqlite
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'discord_bot.db')
+
+# Cache Settings
+GUILD_CACHE_SIZE = 5000
+GUILD_CACHE_TTL = 60  # without a change stream, cached configs are revalidated once they are this old
+PREMIUM_CACHE_TTL = 600  # bounds how long a premium change made by another process can go unseen
+RENDER_CACHE_SIZE = 4096
+
+# Leveling Settings
+XP_COOLDOWN = 60
+LEVEL_FLUSH_INTERVAL = 15  # seconds between write-behind flushes
+LEVEL_FLUSH_THRESHOLD = 500  # dirty entries that trigger an early flush
+LEVEL_BUFFER_IDLE = 600  # seconds before a clean entry is dropped from memory
+LEADERBOARD_CACHE_SIZE = 1000  # guild rankings kept in memory, least recently used are dropped
+
+# Asset Cache Settings
+ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR', os.path.join('cache', 'assets'))
+ASSET_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+ASSET_DISK_CACHE_BYTES = 512 * 1024 * 1024
+ASSET_MAX_BYTES = 8 * 1024 * 1024  # larger downloads are refused
+ASSET_HTTP_CONNECTIONS = 20
+ASSET_HTTP_TIMEOUT = 15
+
+# Rank Card Settings
+RANK_CARD_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+RANK_CARD_CACHE_SIZE = 1024
+RANK_CARD_XP_BUCKETS = 50  # XP bar resolution; progress within a bucket reuses the cached card
+RANK_CARD_FONT = os.getenv('RANK_CARD_FONT', 'DejaVuSans-Bold.ttf')
+# Workers must not be forked from the running bot: fork copies the event loop and the Motor/aiohttp threads mid-flight
+RANK_CARD_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Stats Settings
+STATS_FLUSH_INTERVAL = 10  # seconds between combined $inc flushes
+STATS_BUCKET_SECONDS = 60  # per-minute history documents
+GUILD_STATS_BUCKET_SECONDS = 3600  # per-guild activity is kept in hourly buckets
+STATS_CHART_TTL = 300  # seconds a rendered server stats chart is reused
+STATS_CHART_CACHE_SIZE = 256
+STATS_CHART_RANGES = {  # period -> (span, width of one chart point) in seconds
+    "24h": (86400, 3600),
+    "7d": (7 * 86400, 6 * 3600),
+    "30d": (30 * 86400, 86400)
+}
+STATS_CHART_SERIES = ("messages", "joins", "xp")
+
+# Instrumentation Settings
+DB_LATENCY_BUCKETS = [0.00005 * 1.25 ** i for i in range(64)]  # upper bounds in seconds, 50µs up to ~65s
+DB_PAYLOAD_SAMPLE_RATE = 16  # measure payload sizes on every Nth call per method
+DB_PAYLOAD_SAMPLE_ITEMS = 16  # container items walked per level when estimating a payload; the rest is extrapolated
+DB_PAYLOAD_MAX_DEPTH = 3
+
+# Outbound Settings
+PRIORITY_REPLY = 0  # command replies
+PRIORITY_DM = 1
+PRIORITY_NOTICE = 2  # AFK notices
+PRIORITY_ANNOUNCEMENT = 3  # level-ups, welcome and premium notices
+PRIORITY_LOG = 4
+OUTBOUND_LANES = ("reply", "dm", "notice", "announcement", "log")
+OUTBOUND_GLOBAL_RATE = 45  # messages per second across the bot (Discord allows 50 requests/s)
+OUTBOUND_CHANNEL_RATE = 1.0  # sustained messages per second per channel
+OUTBOUND_CHANNEL_BURST = 5  # Discord allows 5 messages per 5s per channel
+OUTBOUND_CONCURRENCY = 16
+OUTBOUND_BUCKETS_MAX = 10000
+
+# Shop Settings
+DEFAULT_SHOP_ITEMS = [
+    {"id": "role_color", "name": "Custom Role Color", "description": "Change your role color", "price": 500, "premium": False},
+    {"id": "rename", "name": "Nickname Change", "description": "Change your nickname", "price": 200, "premium": False},
+    {"id": "vip_role", "name": "VIP Role", "description": "Get a special VIP role", "price": 2000, "premium": False},
+    {"id": "lootbox", "name": "Lootbox", "description": "Get random rewards", "price": 300, "premium": False},
+    {"id": "xp_boost", "name": "XP Boost (1 hour)", "description": "Get 2x XP for 1 hour", "price": 1000, "premium": True},
+    {"id": "money_boost", "name": "Money Boost (1 hour)", "description": "Get 2x money from work for 1 hour", "price": 1500, "premium": True}
+]
+SHOP_PAGE_SIZE = 10
+
+# Moderation Settings
+CASE_ID_BLOCK_SIZE = 1  # >1 reserves case IDs in blocks per process (IDs may then have gaps)
+INFRACTIONS_PAGE_SIZE = 10
+BAN_INDEX_ENABLED = True  # keep each guild's ban list in memory after the first lookup
+BANLIST_PAGE_SIZE = 20
+LOG_DEBOUNCE = 1.5  # seconds a log channel collects embeds before sending
+LOG_QUEUE_MAX = 500  # queued embeds per log channel before the oldest are dropped
+LOG_MAX_RETRIES = 5
+PERMISSION_CONCURRENCY = 5  # channel overwrite edits in flight at once
+MUTE_ROLE_PERMISSIONS = {"send_messages": False, "add_reactions": False}
+MASS_ACTION_CONCURRENCY = 4  # Discord API calls in flight at once for massban/masskick
+MASS_ACTION_MAX_TARGETS = 1000
+MASS_ACTION_CASE_BATCH = 25  # completed actions recorded as cases in one write while a mass action runs
+PURGE_MAX_AMOUNT = 10000
+PURGE_SCAN_LIMIT = 50000  # history messages walked before a filtered purge gives up
+PURGE_BULK_MAX_AGE = datetime.timedelta(days=14, minutes=-5)  # bulk delete rejects anything older than 14 days
+PURGE_SINGLE_DELETE_DELAY = 1.0  # seconds between deletes of messages too old for bulk delete
+PURGE_QUEUE_SIZE = 100  # old messages waiting for single delete before history paging pauses
+PURGE_PROGRESS_INTERVAL = 5
+PURGE_REGEX_MAX_LENGTH = 100
+PURGE_REGEX_BUDGET = 2.0  # seconds of regex matching one purge may spend; the worker is killed past it
+
+# LRU Cache
+class LRUCache:
+    """Bounded least-recently-used map with hit, miss, eviction and invalidation counters"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            evicted, _ = self.entries.popitem(last=False)
+            self.evictions += 1
+            self.dropped(evicted)
+    
+    def invalidate(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+        self.dropped(key)
+    
+    def clear(self):
+        self.invalidations += len(self.entries)
+        for key in self.entries:
+            self.dropped(key)
+        self.entries.clear()
+    
+    def dropped(self, key):
+        # Called for every entry that leaves the cache
+        pass
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+# Guild Config Cache
+class GuildCache(LRUCache):
+    """Guild config documents keyed by guild ID, with the time each was fetched"""
+    def __init__(self, max_size: int = GUILD_CACHE_SIZE):
+        super().__init__(max_size)
+        self.fetched_at = {}
+    
+    def put(self, guild_id: int, document: dict):
+        self.fetched_at[guild_id] = time.monotonic()
+        super().put(guild_id, document)
+    
+    def age(self, guild_id: int) -> float:
+        # Seconds since the entry was last fetched or revalidated
+        return time.monotonic() - self.fetched_at.get(guild_id, float("-inf"))
+    
+    def touch(self, guild_id: int):
+        if guild_id in self.entries:
+            self.fetched_at[guild_id] = time.monotonic()
+    
+    def dropped(self, guild_id: int):
+        self.fetched_at.pop(guild_id, None)
+
+# Request Coalescing
+class SharedTasks:
+    """In-flight tasks by key, so concurrent callers asking for the same thing share one load"""
+    def __init__(self):
+        self.tasks = {}
+        self.shared = 0  # calls that joined a task another caller started
+    
+    async def run(self, key, factory):
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.tasks[key] = task
+            task.add_done_callback(lambda _: self.tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # One caller being cancelled must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+# Leaderboard Index
+class LeaderboardIndex:
+    """Per-guild XP ranking kept as a sorted array of (-xp, user_id) keys"""
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.keys = []
+        self.xp = {}
+    
+    def load(self, documents):
+        # documents arrive sorted by xp descending from the guild_xp index
+        self.xp = {document["user_id"]: document.get("xp", 0) for document in documents}
+        self.keys = sorted((-xp, user_id) for user_id, xp in self.xp.items())
+    
+    def update(self, user_id: int, xp: int):
+        old_xp = self.xp.get(user_id)
+        if old_xp == xp:
+            return
+        if old_xp is not None:
+            index = bisect.bisect_left(self.keys, (-old_xp, user_id))
+            del self.keys[index]
+        self.xp[user_id] = xp
+        bisect.insort(self.keys, (-xp, user_id))
+    
+    def rank(self, user_id: int) -> Optional[int]:
+        xp = self.xp.get(user_id)
+        if xp is None:
+            return None
+        return bisect.bisect_left(self.keys, (-xp, user_id)) + 1
+    
+    def page(self, offset: int, limit: int) -> List[tuple]:
+        # Returns (rank, user_id, xp) for one slice of the ranking
+        return [(offset + i + 1, user_id, -neg_xp) for i, (neg_xp, user_id) in enumerate(self.keys[offset:offset + limit])]
+    
+    def __len__(self):
+        return len(self.keys)
+
+# Ban Index
+class BanIndex:
+    """Per-guild banned user IDs, paginated from the API once and kept current by ban events"""
     def __init__(self):
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
-        self.db = self.client.discord_bot
-        self.users = self.db.users
-        self.guilds = self.db.guilds
-        self.economy = self.db.economy
-        self.leveling = self.db.leveling
-        self.music = self.db.music
-        self.tickets = self.db.tickets
-        self.moderation = self.db.moderation
-        self.premium = self.db.premium
-        self.stats = self.db.stats
-        logger.info("Connected to MongoDB")
+        self.guilds = {}  # guild_id -> {user_id: reason}
+        self.pending = {}  # guild_id -> events seen while the initial load was running
+        self.locks = defaultdict(asyncio.Lock)
+        self.generation = 0  # bumped whenever gateway events may have been missed
+    
+    def loaded(self, guild_id: int) -> bool:
+        return guild_id in self.guilds
+    
+    async def load(self, guild) -> dict:
+        if guild.id in self.guilds:
+            return self.guilds[guild.id]
         
+        async with self.locks[guild.id]:
+            if guild.id in self.guilds:
+                return self.guilds[guild.id]
+            
+            generation = self.generation
+            self.pending[guild.id] = []
+            try:
+                bans = {}
+                async for entry in guild.bans(limit=None):
+                    bans[entry.user.id] = entry.reason
+            except Exception:
+                self.pending.pop(guild.id, None)
+                raise
+            
+            # Replay events that arrived mid-pagination so they are not overwritten
+            for user_id, banned, reason in self.pending.pop(guild.id):
+                if banned:
+                    bans[user_id] = reason
+                else:
+                    bans.pop(user_id, None)
+            # A load that spanned a reconnect may have missed events, so it is served once but not kept
+            if generation == self.generation:
+                self.guilds[guild.id] = bans
+            logger.info(f"Indexed {len(bans)} bans for guild {guild.id}")
+            return bans
+    
+    def record(self, guild_id: int, user_id: int, banned: bool, reason: str = None):
+        if guild_id in self.pending:
+            self.pending[guild_id].append((user_id, banned, reason))
+        bans = self.guilds.get(guild_id)
+        if bans is None:
+            return
+        if banned:
+            bans[user_id] = reason
+        else:
+            bans.pop(user_id, None)
+    
+    def is_banned(self, guild_id: int, user_id: int) -> Optional[bool]:
+        # None means the guild has not been indexed yet
+        bans = self.guilds.get(guild_id)
+        if bans is None:
+            return None
+        return user_id in bans
+    
+    def forget(self, guild_id: int):
+        self.guilds.pop(guild_id, None)
+        self.locks.pop(guild_id, None)
+    
+    def mark_stale(self):
+        # Ban events sent while the gateway was disconnected are never replayed,
+        # so every index is dropped and rebuilt on its next load
+        if self.guilds:
+            logger.info(f"Dropping ban indexes for {len(self.guilds)} guilds after reconnect")
+        self.guilds.clear()
+        self.generation += 1
+
+ban_index = BanIndex()
+
+async def fetch_ban_entry(guild, user_id: int):
+    # Returns the BanEntry or None, without paginating the guild's whole ban list
+    if BAN_INDEX_ENABLED and ban_index.is_banned(guild.id, user_id) is False:
+        return None
+    try:
+        entry = await guild.fetch_ban(discord.Object(id=user_id))
+    except discord.NotFound:
+        ban_index.record(guild.id, user_id, False)
+        return None
+    ban_index.record(guild.id, user_id, True, entry.reason)
+    return entry
+
+# Database Instrumentation
+class MethodMetrics:
+    """Counters and a fixed-bucket latency histogram for one storage primitive"""
+    __slots__ = ("calls", "errors", "in_flight", "max_in_flight", "total", "max", "buckets", "payload_bytes", "payload_samples")
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(DB_LATENCY_BUCKETS) + 1)
+        self.payload_bytes = 0
+        self.payload_samples = 0
+    
+    def start(self):
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+    
+    def finish(self, elapsed: float, args: tuple, kwargs: dict, result):
+        self.in_flight -= 1
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[bisect.bisect_left(DB_LATENCY_BUCKETS, elapsed)] += 1
+        
+        if DB_PAYLOAD_SAMPLE_RATE <= 1 or self.calls % DB_PAYLOAD_SAMPLE_RATE == 0:
+            self.payload_bytes += payload_size(args) + payload_size(kwargs) + payload_size(result)
+            self.payload_samples += 1
+    
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the requested rank, in seconds
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min(DB_LATENCY_BUCKETS[index], self.max) if index < len(DB_LATENCY_BUCKETS) else self.max
+        return self.max
+    
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "avg_ms": self.total / self.calls * 1000 if self.calls else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            "total_ms": self.total * 1000,
+            "avg_payload_bytes": self.payload_bytes / self.payload_samples if self.payload_samples else 0
+        }
+
+class DatabaseMetrics:
+    """Per-primitive latency, in-flight, error and payload statistics for storage round trips"""
+    def __init__(self):
+        self.methods = defaultdict(MethodMetrics)
+        self.started = time.time()
+    
+    def method(self, name: str) -> MethodMetrics:
+        return self.methods[name]
+    
+    def snapshot(self, method: str = None) -> dict:
+        if method is not None:
+            return self.methods[method].snapshot() if method in self.methods else {}
+        return {name: metrics.snapshot() for name, metrics in self.methods.items()}
+    
+    def slowest(self, limit: int = 10, key: str = "total_ms") -> List[tuple]:
+        snapshot = self.snapshot()
+        return sorted(snapshot.items(), key=lambda item: item[1][key], reverse=True)[:limit]
+    
+    def reset(self):
+        self.methods.clear()
+        self.started = time.time()
+
+def payload_size(value, depth: int = 0) -> int:
+    # Rough JSON size from a bounded walk, so sampling a guild's whole leveling list
+    # costs a few hundred items at most instead of serializing it inside the timed call
+    if value is None:
+        return 4
+    if isinstance(value, (str, bytes)):
+        return len(value) + 2
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, (int, float)):
+        return len(repr(value))
+    if isinstance(value, dict):
+        if depth >= DB_PAYLOAD_MAX_DEPTH:
+            return 16 * len(value)
+        sizes = [payload_size(key, depth + 1) + payload_size(item, depth + 1) for key, item in itertools.islice(value.items(), DB_PAYLOAD_SAMPLE_ITEMS)]
+    elif isinstance(value, (list, tuple, set)):
+        if depth >= DB_PAYLOAD_MAX_DEPTH:
+            return 16 * len(value)
+        sizes = [payload_size(item, depth + 1) for item in itertools.islice(value, DB_PAYLOAD_SAMPLE_ITEMS)]
+    else:
+        return 24  # datetimes, ObjectIds and other scalars
+    if not sizes:
+        return 2
+    # Items past the sample are assumed to look like the ones walked
+    return 2 + sum(sizes) * len(value) // len(sizes)
+
+def instrument_storage(storage: StorageBackend, metrics: DatabaseMetrics) -> StorageBackend:
+    # Wraps the storage primitives on the instance, so Database cache hits and
+    # in-memory buffers never show up next to real round trips
+    def wrap(method, name):
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            method_metrics = metrics.method(name)
+            method_metrics.start()
+            result = None
+            start = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+                return result
+            except Exception:
+                method_metrics.errors += 1
+                raise
+            finally:
+                method_metrics.finish(time.perf_counter() - start, args, kwargs, result)
+        return wrapper
+    
+    # Only the abstract primitives: change feeds would sit in flight forever
+    for name in StorageBackend.__abstractmethods__:
+        setattr(storage, name, wrap(getattr(storage, name), name))
+    return storage
+
+# Database Setup
+class Database:
+    def __init__(self, storage: StorageBackend = None):
+        self.metrics = DatabaseMetrics()
+        self.storage = instrument_storage(storage or create_storage(STORAGE_BACKEND, MONGODB_URI, SQLITE_PATH), self.metrics)
+        
+        # Guild configs are served from memory; the change stream watcher keeps every bot
+        # process in sync, otherwise entries are revalidated by version every GUILD_CACHE_TTL
+        self.guild_cache = GuildCache()
+        self.guild_stream_active = False
+        self.guild_watcher = None
+        
+        # AFK users by ID; anyone missing from the registry is not AFK
+        self.afk_users = {}
+        self.afk_loaded = False
+        self.afk_watcher = None
+        
+        # Premium entitlements: guild_id -> (expiry, fetched_at); expiry is 0 for non-premium guilds
+        self.premium_cache = {}
+        
+        # Write-behind XP state keyed by (user_id, guild_id), flushed as one batch
+        self.level_buffer = {}
+        self.dirty_levels = set()
+        self.level_flush_lock = asyncio.Lock()
+        self.level_flush_task = None
+        
+        # Leaderboards are seeded per guild on first use and kept current by add_level_xp and update_level
+        self.leaderboards = LRUCache(LEADERBOARD_CACHE_SIZE)
+        self.leaderboard_locks = defaultdict(asyncio.Lock)
+        
+        # Stat counters are aggregated in memory and flushed as one combined increment
+        self.pending_stats = Counter()
+        self.pending_stat_buckets = defaultdict(Counter)
+        self.pending_guild_stats = defaultdict(Counter)  # (guild_id, hour bucket) -> counters
+        self.stats_flush_lock = asyncio.Lock()
+        
+        # Moderation case IDs come from the storage counters
+        self.seeded_case_counters = set()
+        self.case_id_blocks = {}
+        self.case_id_lock = asyncio.Lock()
+        self.prepared = False
+    
+    async def prepare(self):
+        if not self.prepared:
+            await self.storage.prepare()
+            self.prepared = True
+    
     async def get_user(self, user_id: int):
-        return await self.users.find_one({"_id": user_id})
+        return await self.storage.find_user(user_id)
     
     async def update_user(self, user_id: int, data: dict):
-        await self.users.update_one({"_id": user_id}, {"$set": data}, upsert=True)
+        await self.storage.set_user(user_id, data)
+        if "afk" in data:
+            self.sync_afk(user_id, data["afk"])
+    
+    def sync_afk(self, user_id: int, afk: Optional[dict]):
+        if afk:
+            self.afk_users[user_id] = afk
+        else:
+            self.afk_users.pop(user_id, None)
+    
+    async def load_afk_registry(self):
+        registry = await self.storage.find_afk_users()
+        self.afk_users = registry
+        self.afk_loaded = True
+        logger.info(f"Loaded {len(registry)} AFK users")
+    
+    async def get_afk(self, user_id: int) -> Optional[dict]:
+        if self.afk_loaded:
+            return self.afk_users.get(user_id)
+        user_data = await self.get_user(user_id)
+        return user_data.get("afk") if user_data else None
+    
+    async def clear_afk(self, user_id: int):
+        await self.update_user(user_id, {"afk": None})
+    
+    def start_afk_watcher(self):
+        if self.afk_watcher is None or self.afk_watcher.done():
+            self.afk_watcher = asyncio.create_task(self.watch_afk())
+    
+    async def watch_afk(self):
+        # Picks up AFK changes made by other bot processes
+        try:
+            async for user_id, afk in self.storage.watch_afk_changes():
+                self.sync_afk(user_id, afk)
+        except NotImplementedError:
+            logger.info(f"{self.storage.name} storage has no change feed, AFK registry only tracks this process")
+        except OperationFailure as e:
+            logger.warning(f"AFK change stream unavailable, registry only tracks this process: {e}")
+        except PyMongoError as e:
+            logger.error(f"AFK change stream stopped: {e}")
     
     async def get_guild(self, guild_id: int):
-        return await self.guilds.find_one({"_id": guild_id})
+        cached = self.guild_cache.get(guild_id)
+        if cached is None:
+            document = await self.storage.find_guild(guild_id)
+            if document is not None:
+                self.guild_cache.put(guild_id, document)
+                return copy.deepcopy(document)
+            return None
+        
+        if not self.guild_stream_active and self.guild_cache.age(guild_id) > GUILD_CACHE_TTL:
+            # No change stream: once the entry is stale, only transfer the document if another process bumped its version
+            changed = await self.storage.find_guild_if_changed(guild_id, cached.get("_version"))
+            if changed is not None:
+                self.guild_cache.put(guild_id, changed)
+                return copy.deepcopy(changed)
+            self.guild_cache.touch(guild_id)
+        
+        return copy.deepcopy(cached)
     
     async def update_guild(self, guild_id: int, data: dict):
-        await self.guilds.update_one({"_id": guild_id}, {"$set": data}, upsert=True)
+        data = {key: value for key, value in data.items() if key != "_version"}
+        document = await self.storage.set_guild(guild_id, data)
+        self.guild_cache.put(guild_id, document)
+    
+    def guild_cache_stats(self) -> dict:
+        stats = self.guild_cache.stats()
+        stats["change_stream"] = self.guild_stream_active
+        return stats
+    
+    def start_guild_watcher(self):
+        if self.guild_watcher is None or self.guild_watcher.done():
+            self.guild_watcher = asyncio.create_task(self.watch_guilds())
+    
+    async def watch_guilds(self):
+        # Invalidate cached configs whenever any process writes a guild config
+        try:
+            async for guild_id, version in self.storage.watch_guild_changes():
+                if guild_id is None:
+                    # Stream (re)started or the collection went away
+                    self.guild_cache.clear()
+                    if not self.guild_stream_active:
+                        self.guild_stream_active = True
+                        logger.info("Watching guild config changes")
+                    continue
+                
+                # Our own write-through already cached this version
+                cached = self.guild_cache.entries.get(guild_id)
+                if cached is not None and version is not None and cached.get("_version") == version:
+                    continue
+                self.guild_cache.invalidate(guild_id)
+        except NotImplementedError:
+            logger.info(f"{self.storage.name} storage has no change feed, guild configs are revalidated every {GUILD_CACHE_TTL}s")
+        except OperationFailure as e:
+            logger.warning(f"Guild change stream unavailable, falling back to version checks: {e}")
+        except PyMongoError as e:
+            logger.error(f"Guild change stream stopped: {e}")
+        finally:
+            # Events may have been missed while the stream was down
+            self.guild_stream_active = False
+            self.guild_cache.clear()
     
     async def get_economy(self, user_id: int):
-        return await self.economy.find_one({"_id": user_id})
+        return await self.storage.find_economy(user_id)
     
     async def update_economy(self, user_id: int, data: dict):
-        await self.economy.update_one({"_id": user_id}, {"$set": data}, upsert=True)
+        await self.storage.set_economy(user_id, data)
+    
+    def economy_defaults(self, starting_balance: int) -> dict:
+        return {
+            "balance": starting_balance,
+            "bank": 0,
+            "last_daily": 0,
+            "last_work": 0,
+            "inventory": {}
+        }
+    
+    async def get_or_create_economy(self, user_id: int, starting_balance: int):
+        return await self.storage.create_economy(user_id, self.economy_defaults(starting_balance))
+    
+    async def claim_economy_reward(self, user_id: int, field: str, cooldown: int, amount: int, starting_balance: int):
+        # Returns (claimed, document); the cooldown check is atomic in storage
+        now = time.time()
+        document = None
+        for _ in range(2):
+            document = await self.storage.claim_economy(user_id, field, now - cooldown, amount, now)
+            if document is not None:
+                return True, document
+            
+            # Either on cooldown or the account does not exist yet
+            document = await self.get_or_create_economy(user_id, starting_balance)
+            if document.get(field, 0) > now - cooldown:
+                return False, document
+        return False, document
+    
+    async def move_economy_funds(self, user_id: int, source: str, target: str, amount: Union[int, str], starting_balance: int):
+        # amount is an int, "all" or "half"; returns (moved, document) with moved == 0 if nothing was moved
+        divisor = 1 if amount == "all" else 2
+        
+        document = None
+        for _ in range(2):
+            if isinstance(amount, str):
+                before = await self.storage.move_economy(user_id, source, target, divisor=divisor)
+            else:
+                before = await self.storage.move_economy(user_id, source, target, amount)
+            if before is not None:
+                moved = before.get(source, 0) // divisor if isinstance(amount, str) else amount
+                document = dict(before)
+                document[source] = before.get(source, 0) - moved
+                document[target] = before.get(target, 0) + moved
+                return moved, document
+            
+            document = await self.get_or_create_economy(user_id, starting_balance)
+            if not isinstance(amount, str) and document.get(source, 0) < amount:
+                return 0, document
+        return 0, document
+    
+    async def debit_balance(self, user_id: int, amount: int, starting_balance: int, item_id: str = None):
+        # Guarded debit: returns the updated document, or None if the wallet cannot cover amount
+        for _ in range(2):
+            document = await self.storage.debit_economy(user_id, amount, item_id)
+            if document is not None:
+                return document
+            
+            document = await self.get_or_create_economy(user_id, starting_balance)
+            if document.get("balance", 0) < amount:
+                return None
+        return None
+    
+    async def credit_balance(self, user_id: int, amount: int, starting_balance: int):
+        return await self.storage.credit_economy(user_id, amount, self.economy_defaults(starting_balance))
+    
+    async def transfer_balance(self, sender_id: int, recipient_id: int, amount: int, starting_balance: int):
+        # Ordered pair of atomic writes: guarded debit first, then credit (refunded if the credit fails)
+        sender = await self.debit_balance(sender_id, amount, starting_balance)
+        if sender is None:
+            return None, None
+        
+        try:
+            recipient = await self.credit_balance(recipient_id, amount, starting_balance)
+        except Exception:
+            await self.storage.increment_balance(sender_id, amount)
+            raise
+        return sender, recipient
+    
+    async def purchase_item(self, user_id: int, item_id: str, price: int, starting_balance: int):
+        return await self.debit_balance(user_id, price, starting_balance, item_id)
     
     async def get_level(self, user_id: int, guild_id: int):
-        return await self.leveling.find_one({"user_id": user_id, "guild_id": guild_id})
+        entry = self.level_buffer.get((user_id, guild_id))
+        if entry is not None:
+            return {
+                "user_id": user_id,
+                "guild_id": guild_id,
+                "xp": entry["xp"],
+                "level": entry["level"],
+                "last_message": entry["last_message"]
+            }
+        return await self.storage.find_level(user_id, guild_id)
     
     async def update_level(self, user_id: int, guild_id: int, data: dict):
-        await self.leveling.update_one(
-            {"user_id": user_id, "guild_id": guild_id},
-            {"$set": data},
-            upsert=True
-        )
+        # Persist pending XP first so the buffered delta is not applied on top of this write
+        if (user_id, guild_id) in self.level_buffer:
+            await self.flush_levels()
+            self.level_buffer.pop((user_id, guild_id), None)
+        await self.storage.set_level(user_id, guild_id, data)
+        
+        # Admin edits bypass add_level_xp, so the ranking is patched here
+        leaderboard = self.leaderboards.entries.get(guild_id)
+        if leaderboard is not None:
+            if "xp" in data:
+                leaderboard.update(user_id, data["xp"])
+            else:
+                self.leaderboards.invalidate(guild_id)
+    
+    async def add_level_xp(self, user_id: int, guild_id: int, amount: int):
+        # Returns (old_level, new_level), or None while the user is on cooldown.
+        # Buffer entries outlive the cooldown (LEVEL_BUFFER_IDLE > XP_COOLDOWN), so a user
+        # still on cooldown is always rejected here without touching storage
+        now = time.time()
+        key = (user_id, guild_id)
+        entry = self.level_buffer.get(key)
+        if entry is None:
+            document = await self.storage.find_level(user_id, guild_id) or {}
+            entry = self.level_buffer.setdefault(key, {
+                "xp": document.get("xp", 0),
+                "level": document.get("level", 0),
+                "last_message": document.get("last_message", 0),
+                "pending_xp": 0
+            })
+        
+        if now - entry["last_message"] < XP_COOLDOWN:
+            return None
+        
+        old_level = entry["level"]
+        entry["xp"] += amount
+        entry["pending_xp"] += amount
+        entry["last_message"] = now
+        entry["level"] = int(0.1 * (entry["xp"] ** 0.5))
+        self.dirty_levels.add(key)
+        
+        leaderboard = self.leaderboards.entries.get(guild_id)
+        if leaderboard is not None:
+            leaderboard.update(user_id, entry["xp"])
+        
+        if len(self.dirty_levels) >= LEVEL_FLUSH_THRESHOLD:
+            if self.level_flush_task is None or self.level_flush_task.done():
+                self.level_flush_task = asyncio.create_task(self.flush_levels())
+        
+        return old_level, entry["level"]
+    
+    async def get_leaderboard(self, guild_id: int) -> LeaderboardIndex:
+        leaderboard = self.leaderboards.get(guild_id)
+        if leaderboard is not None:
+            return leaderboard
+        
+        async with self.leaderboard_locks[guild_id]:
+            leaderboard = self.leaderboards.entries.get(guild_id)
+            if leaderboard is not None:
+                return leaderboard
+            
+            leaderboard = LeaderboardIndex(guild_id)
+            leaderboard.load(await self.storage.find_guild_levels(guild_id))
+            
+            # Buffered XP has not reached storage yet
+            for (user_id, entry_guild_id), entry in self.level_buffer.items():
+                if entry_guild_id == guild_id:
+                    leaderboard.update(user_id, entry["xp"])
+            
+            self.leaderboards.put(guild_id, leaderboard)
+            # Waiters already hold the lock object; later callers hit the cache
+            self.leaderboard_locks.pop(guild_id, None)
+            return leaderboard
+    
+    async def flush_levels(self):
+        async with self.level_flush_lock:
+            batch = []
+            for key in self.dirty_levels:
+                entry = self.level_buffer[key]
+                user_id, guild_id = key
+                batch.append((user_id, guild_id, entry["pending_xp"], entry["level"], entry["last_message"]))
+                entry["pending_xp"] = 0
+            self.dirty_levels.clear()
+            
+            if batch:
+                try:
+                    await self.storage.apply_level_deltas(batch)
+                except Exception:
+                    # Put the deltas back so the next flush retries them
+                    for user_id, guild_id, pending, _, _ in batch:
+                        self.level_buffer[(user_id, guild_id)]["pending_xp"] += pending
+                        self.dirty_levels.add((user_id, guild_id))
+                    raise
+            
+            # Drop clean entries for users who have gone quiet
+            cutoff = time.time() - LEVEL_BUFFER_IDLE
+            idle = [key for key, entry in self.level_buffer.items() if key not in self.dirty_levels and entry["last_message"] < cutoff]
+            for key in idle:
+                del self.level_buffer[key]
+            
+            return len(batch)
+    
+    async def close(self):
+        # Each buffer is flushed independently so one failure does not lose the rest
+        for flush in (self.flush_levels, self.flush_stats):
+            try:
+                await flush()
+            except Exception as e:
+                logger.error(f"Failed to run {flush.__name__} on shutdown: {e}")
+        await self.storage.close()
     
     async def get_premium(self, guild_id: int):
-        return await self.premium.find_one({"_id": guild_id})
+        return await self.storage.find_premium(guild_id)
     
     async def update_premium(self, guild_id: int, data: dict):
-        await self.premium.update_one({"_id": guild_id}, {"$set": data}, upsert=True)
+        document = await self.storage.set_premium(guild_id, data)
+        self.cache_premium(guild_id, document)
+    
+    def cache_premium(self, guild_id: int, data: dict):
+        expiry = data.get("expiry", 0) if data and data.get("active", False) else 0
+        self.premium_cache[guild_id] = (expiry, time.time())
     
     async def is_premium(self, guild_id: int) -> bool:
-        data = await self.get_premium(guild_id)
-        if not data:
-            return False
-        return data.get("active", False) and data.get("expiry", 0) > time.time()
+        now = time.time()
+        entry = self.premium_cache.get(guild_id)
+        if entry is None or now - entry[1] > PREMIUM_CACHE_TTL:
+            self.cache_premium(guild_id, await self.get_premium(guild_id))
+            entry = self.premium_cache[guild_id]
+        # Comparing against the stored expiry lapses the entitlement the moment it expires
+        return entry[0] > now
+    
+    async def get_active_premium(self) -> List[dict]:
+        return await self.storage.find_active_premium()
+    
+    async def warm_premium_cache(self, guild_ids: List[int]):
+        # One query for every active subscription; every other guild is cached as non-premium
+        now = time.time()
+        for guild_id in guild_ids:
+            self.premium_cache[guild_id] = (0, now)
+        for data in await self.storage.find_active_premium(now):
+            self.premium_cache[data["_id"]] = (data["expiry"], now)
     
     async def get_ticket(self, ticket_id: str):
-        return await self.tickets.find_one({"_id": ticket_id})
+        return await self.storage.find_ticket(ticket_id)
     
     async def update_ticket(self, ticket_id: str, data: dict):
-        await self.tickets.update_one({"_id": ticket_id}, {"$set": data}, upsert=True)
+        await self.storage.set_ticket(ticket_id, data)
     
     async def get_guild_tickets(self, guild_id: int):
-        return await self.tickets.find({"guild_id": guild_id}).to_list(length=100)
+        return await self.storage.find_guild_tickets(guild_id, 100)
     
     async def get_moderation_case(self, case_id: int, guild_id: int):
-        return await self.moderation.find_one({"case_id": case_id, "guild_id": guild_id})
+        return await self.storage.find_case(case_id, guild_id)
     
     async def create_moderation_case(self, case_data: dict):
-        await self.moderation.insert_one(case_data)
+        await self.storage.insert_case(case_data)
     
-    async def get_user_cases(self, user_id: int, guild_id: int):
-        return await self.moderation.find({"user_id": user_id, "guild_id": guild_id}).to_list(length=100)
+    async def create_moderation_cases(self, cases: List[dict]):
+        if cases:
+            await self.storage.insert_cases(cases)
     
-    async def increment_stats(self, stat_name: str, amount: int = 1):
-        await self.stats.update_one(
-            {"_id": "bot_stats"},
-            {"$inc": {stat_name: amount}},
-            upsert=True
-        )
+    async def seed_case_counter(self, guild_id: int):
+        # Carry over the legacy case_count stored on the guild config so IDs never repeat
+        if guild_id in self.seeded_case_counters:
+            return
+        guild_data = await self.get_guild(guild_id) or {}
+        await self.storage.max_counter(f"cases:{guild_id}", guild_data.get("case_count", 0))
+        self.seeded_case_counters.add(guild_id)
+    
+    async def reserve_case_ids(self, guild_id: int, count: int) -> int:
+        # Atomically reserves count IDs and returns the last one
+        await self.seed_case_counter(guild_id)
+        return await self.storage.increment_counter(f"cases:{guild_id}", count)
+    
+    async def allocate_case_ids(self, guild_id: int, count: int = 1, block_size: int = CASE_ID_BLOCK_SIZE) -> List[int]:
+        if block_size <= 1:
+            last = await self.reserve_case_ids(guild_id, count)
+            return list(range(last - count + 1, last + 1))
+        
+        async with self.case_id_lock:
+            case_ids = []
+            while len(case_ids) < count:
+                block = self.case_id_blocks.get(guild_id)
+                if block is None or block[0] > block[1]:
+                    # Reserve enough for the whole request in one round trip
+                    size = max(block_size, count - len(case_ids))
+                    last = await self.reserve_case_ids(guild_id, size)
+                    block = [last - size + 1, last]
+                    self.case_id_blocks[guild_id] = block
+                take = min(count - len(case_ids), block[1] - block[0] + 1)
+                case_ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+            return case_ids
+    
+    async def allocate_case_id(self, guild_id: int) -> int:
+        return (await self.allocate_case_ids(guild_id, 1))[0]
+    
+    async def get_user_cases(self, user_id: int, guild_id: int, limit: int = 10, before: tuple = None):
+        # Newest first; before is the (timestamp, case_id) of the last case on the previous page
+        return await self.storage.find_user_cases(user_id, guild_id, limit, before)
+    
+    async def count_user_cases(self, user_id: int, guild_id: int) -> int:
+        return await self.storage.count_user_cases(user_id, guild_id)
+    
+    def increment_stats(self, stat_name: str, amount: int = 1):
+        # Never touches the database; flush_stats persists the aggregated counters
+        bucket = int(time.time() // STATS_BUCKET_SECONDS * STATS_BUCKET_SECONDS)
+        self.pending_stats[stat_name] += amount
+        self.pending_stat_buckets[bucket][stat_name] += amount
+    
+    def increment_guild_stats(self, guild_id: int, stat_name: str, amount: int = 1):
+        # Hourly per-guild activity for the server stats charts, flushed with the bot stats
+        bucket = int(time.time() // GUILD_STATS_BUCKET_SECONDS * GUILD_STATS_BUCKET_SECONDS)
+        self.pending_guild_stats[(guild_id, bucket)][stat_name] += amount
+    
+    async def flush_stats(self):
+        async with self.stats_flush_lock:
+            if not self.pending_stats and not self.pending_guild_stats:
+                return 0
+            
+            totals, self.pending_stats = self.pending_stats, Counter()
+            buckets, self.pending_stat_buckets = self.pending_stat_buckets, defaultdict(Counter)
+            guild_buckets, self.pending_guild_stats = self.pending_guild_stats, defaultdict(Counter)
+            
+            totals_written = False
+            try:
+                if totals:
+                    await self.storage.apply_stat_deltas(
+                        dict(totals),
+                        {bucket: dict(counters) for bucket, counters in buckets.items()}
+                    )
+                totals_written = True
+                if guild_buckets:
+                    await self.storage.apply_guild_stat_deltas(
+                        {key: dict(counters) for key, counters in guild_buckets.items()}
+                    )
+            except Exception:
+                # Merge the unwritten counters back so they go out with the next flush
+                if not totals_written:
+                    self.pending_stats.update(totals)
+                    for bucket, counters in buckets.items():
+                        self.pending_stat_buckets[bucket].update(counters)
+                for key, counters in guild_buckets.items():
+                    self.pending_guild_stats[key].update(counters)
+                raise
+            
+            return sum(totals.values())
     
     async def get_stats(self):
-        return await self.stats.find_one({"_id": "bot_stats"})
+        data = await self.storage.find_stats() or {"_id": "bot_stats"}
+        for stat_name, amount in self.pending_stats.items():
+            data[stat_name] = data.get(stat_name, 0) + amount
+        return data
+    
+    async def get_stats_history(self, since: float, until: float = None):
+        return await self.storage.find_stat_buckets(since, until)
+    
+    async def get_guild_stats_history(self, guild_id: int, since: float, until: float = None):
+        return await self.storage.find_guild_stat_buckets(guild_id, since, until)
 
 # Initialize Database
 db = Database()
@@ -229,11 +1164,30 @@ async def on_ready():
     logger.info(f"Bot connected as {bot.user.name} ({bot.user.id})")
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name="!help | Premium Bot"))
     
+    # on_ready also fires after a reconnect that could not resume, so ban events may have been missed
+    ban_index.mark_stale()
+    
+    # Make sure every query has its index before serving traffic
+    await db.prepare()
+    
     # Start background tasks
-    update_stats.start()
-    check_premium_status.start()
+    db.start_guild_watcher()
+    db.start_afk_watcher()
+    if not db.afk_loaded:
+        await db.load_afk_registry()
+    await db.warm_premium_cache([guild.id for guild in bot.guilds])
+    if not flush_level_buffer.is_running():
+        flush_level_buffer.start()
+    if not flush_stats_buffer.is_running():
+        flush_stats_buffer.start()
+    if not update_stats.is_running():
+        update_stats.start()
+    if not check_premium_status.is_running():
+        check_premium_status.start()
     
-    # Connect to Wavelink nodes
+    # Connect to Wavelink nodes once; the pool reconnects them itself
+    if wavelink.Pool.nodes:
+        return
     try:
         nodes = [
             wavelink.Node(uri=WAVELINK_URI, password=WAVELINK_PASSWORD),
@@ -260,14 +1214,15 @@ async def on_guild_join(guild):
         "prefix": "!",
         "moderation": {
             "log_channel": None,
-            "mute_role": None
+            "mute_role": None,
+            "mute_role_managed": False
         },
         "join_date": datetime.datetime.utcnow(),
         "premium_trial_used": False
     }
     
     await db.update_guild(guild.id, default_config)
-    await db.increment_stats("guilds_joined")
+    db.increment_stats("guilds_joined")
     
     # Try to send welcome message to system channel
     try:
@@ -280,40 +1235,154 @@ async def on_guild_join(guild):
             embed.add_field(name="🛡️ Setup", value="Start by using `!setup` to configure me", inline=False)
             embed.add_field(name="⭐ Premium", value="Check out `!premium` to see exclusive features", inline=False)
             embed.set_footer(text="Made with ❤️ by Claude")
-            await guild.system_channel.send(embed=embed)
+            await outbound.send(guild.system_channel, embed=embed, priority=PRIORITY_ANNOUNCEMENT)
     except Exception as e:
         logger.error(f"Failed to send welcome message to guild {guild.id}: {e}")
 
+@bot.event
+async def on_resumed():
+    # A ban event lost across the resume would otherwise leave a wrong negative cached for good
+    ban_index.mark_stale()
+
 @bot.event
 async def on_guild_remove(guild):
     logger.info(f"Bot removed from guild: {guild.name} ({guild.id})")
-    await db.increment_stats("guilds_left")
+    ban_index.forget(guild.id)
+    db.increment_stats("guilds_left")
 
 @bot.event
-async def on_message(message):
-    # Ignore messages from bots
-    if message.author.bot:
+async def on_guild_channel_create(channel):
+    # Channels created outside a category that carries the mute overwrite need it applied.
+    # Only a role the bot created is touched, a role picked by the server keeps the overwrites its admins chose
+    guild_data = await db.get_guild(channel.guild.id) or {}
+    moderation = guild_data.get("moderation", {})
+    if not moderation.get("mute_role_managed"):
         return
+    mute_role = channel.guild.get_role(moderation.get("mute_role") or 0)
+    if mute_role is None:
+        return
+    summary = await apply_role_permissions(channel.guild, mute_role, MUTE_ROLE_PERMISSIONS, channels=[channel], reason="Mute role resync")
+    for failed_channel, error in summary["failed"]:
+        logger.warning(f"Failed to apply mute role to channel {failed_channel.id}: {error}")
+
+@bot.event
+async def on_member_ban(guild, user):
+    ban_index.record(guild.id, user.id, True)
+
+@bot.event
+async def on_member_unban(guild, user):
+    ban_index.record(guild.id, user.id, False)
+
+@bot.event
+async def on_member_join(member):
+    db.increment_guild_stats(member.guild.id, "joins")
+
+# Message Pipeline
+class MessageContext:
+    """Per-message data shared by all pipeline stages; each lookup runs at most once"""
+    def __init__(self, message):
+        self.message = message
+        self.lookups = {}
     
-    # Process commands
-    await bot.process_commands(message)
+    def fetch(self, name, factory):
+        # Concurrent stages asking for the same data await the same task
+        if name not in self.lookups:
+            self.lookups[name] = asyncio.ensure_future(factory())
+        return self.lookups[name]
     
-    # Only process further for guild messages
-    if not message.guild:
-        return
+    async def guild_config(self):
+        return await self.fetch("guild_config", lambda: db.get_guild(self.message.guild.id))
+    
+    async def author_afk(self):
+        return await self.fetch("author_afk", lambda: db.get_afk(self.message.author.id))
+
+class MessagePipeline:
+    """Runs registered per-message stages concurrently and times each one"""
+    def __init__(self):
+        self.stages = []
+        self.timings = defaultdict(lambda: {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0})
+    
+    def stage(self, name: str, guild_only: bool = True):
+        def decorator(handler):
+            self.stages.append((name, handler, guild_only))
+            return handler
+        return decorator
+    
+    async def run_stage(self, name, handler, context):
+        start = time.perf_counter()
+        try:
+            await handler(context)
+        except Exception as e:
+            self.timings[name]["errors"] += 1
+            logger.error(f"Message stage {name} failed: {e}")
+            logger.error(traceback.format_exc())
+        finally:
+            elapsed = time.perf_counter() - start
+            timing = self.timings[name]
+            timing["calls"] += 1
+            timing["total"] += elapsed
+            timing["max"] = max(timing["max"], elapsed)
     
-    # XP System
-    await add_xp(message.author, message.guild)
+    async def run(self, message):
+        context = MessageContext(message)
+        await asyncio.gather(*(
+            self.run_stage(name, handler, context)
+            for name, handler, guild_only in self.stages
+            if message.guild or not guild_only
+        ))
     
-    # AFK Check
-    await check_afk(message)
+    def stats(self) -> dict:
+        return {
+            name: {
+                "calls": timing["calls"],
+                "errors": timing["errors"],
+                "avg_ms": timing["total"] / timing["calls"] * 1000 if timing["calls"] else 0.0,
+                "max_ms": timing["max"] * 1000
+            }
+            for name, timing in self.timings.items()
+        }
+
+message_pipeline = MessagePipeline()
+
+@message_pipeline.stage("commands", guild_only=False)
+async def commands_stage(context):
+    await bot.process_commands(context.message)
+
+@message_pipeline.stage("xp")
+async def xp_stage(context):
+    await add_xp(context.message.author, context.message.guild, context=context)
+
+@message_pipeline.stage("afk")
+async def afk_stage(context):
+    await check_afk(context.message, context=context)
+
+@message_pipeline.stage("activity")
+async def activity_stage(context):
+    db.increment_guild_stats(context.message.guild.id, "messages")
+
+# Auto-mod features can be added here as further stages
+
+@bot.event
+async def on_message(message):
+    # Ignore messages from bots
+    if message.author.bot:
+        return
     
-    # Auto-mod features can be added here
+    # Commands, XP and AFK checks run concurrently over one shared context
+    await message_pipeline.run(message)
 
 # Background Tasks
 @tasks.loop(minutes=30)
 async def update_stats():
     logger.info("Updating bot statistics")
+    logger.info(f"Guild cache: {db.guild_cache_stats()}")
+    logger.info(f"Render cache: {render_cache.stats()}")
+    logger.info(f"Leaderboards: {db.leaderboards.stats()}")
+    logger.info(f"Asset cache: {asset_cache.stats()}")
+    logger.info(f"Stats charts: {stats_charts.stats()}")
+    logger.info(f"Message pipeline: {message_pipeline.stats()}")
+    logger.info(f"Moderation logs: {log_dispatcher.stats()}")
+    logger.info(f"Outbound messages: {outbound.stats()}")
     stats = {
         "guilds": len(bot.guilds),
         "users": len(bot.users),
@@ -322,10 +1391,24 @@ async def update_stats():
     }
     await db.update_stats(stats)
 
+@tasks.loop(seconds=LEVEL_FLUSH_INTERVAL)
+async def flush_level_buffer():
+    try:
+        await db.flush_levels()
+    except Exception as e:
+        logger.error(f"Failed to flush level buffer: {e}")
+
+@tasks.loop(seconds=STATS_FLUSH_INTERVAL)
+async def flush_stats_buffer():
+    try:
+        await db.flush_stats()
+    except Exception as e:
+        logger.error(f"Failed to flush stats: {e}")
+
 @tasks.loop(hours=12)
 async def check_premium_status():
     logger.info("Checking premium status of guilds")
-    async for premium_data in db.premium.find({"active": True}):
+    for premium_data in await db.get_active_premium():
         guild_id = premium_data["_id"]
         expiry = premium_data.get("expiry", 0)
         
@@ -342,43 +1425,448 @@ async def check_premium_status():
                     color=WARNING_COLOR
                 )
                 try:
-                    await guild.system_channel.send(embed=embed)
+                    await outbound.send(guild.system_channel, embed=embed, priority=PRIORITY_ANNOUNCEMENT)
                 except Exception as e:
                     logger.error(f"Failed to send premium expiry message to guild {guild_id}: {e}")
 
-# Utility Functions
-async def add_xp(user, guild, amount=None):
-    if amount is None:
-        amount = random.randint(5, 15)
+# Outbound Message Scheduler
+class TokenBucket:
+    """Refills rate tokens per second up to capacity"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
     
-    user_level_data = await db.get_level(user.id, guild.id)
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
     
-    if not user_level_data:
-        user_level_data = {
-            "user_id": user.id,
-            "guild_id": guild.id,
-            "xp": amount,
-            "level": 0,
-            "last_message": time.time()
-        }
-    else:
-        # Check if user can earn XP (cooldown of 60 seconds)
-        if time.time() - user_level_data.get("last_message", 0) < 60:
-            return
+    def delay(self, now: float) -> float:
+        # Seconds until a token is available
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def take(self):
+        self.tokens -= 1
+
+class OutboundJob:
+    """One queued message, possibly coalesced from several low-priority posts"""
+    __slots__ = ("key", "priority", "destination", "factory", "contents", "embeds", "future", "enqueued_at")
+    
+    def __init__(self, key: int, priority: int, destination=None, factory=None):
+        self.key = key
+        self.priority = priority
+        self.destination = destination
+        self.factory = factory
+        self.contents = []
+        self.embeds = []
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+class OutboundLane:
+    """One priority lane: a FIFO per channel plus a heap of the time each channel can next send"""
+    def __init__(self):
+        self.queues = {}  # key -> deque of jobs waiting for that channel
+        self.ready = []  # heap of (ready_at, sequence, key), one entry per queued key
+        self.sequence = itertools.count()  # keeps channels with equal ready times in arrival order
+        self.depth = 0
+    
+    def push(self, job: OutboundJob):
+        queue = self.queues.get(job.key)
+        if queue is None:
+            queue = self.queues[job.key] = deque()
+            heapq.heappush(self.ready, (job.enqueued_at, next(self.sequence), job.key))
+        queue.append(job)
+        self.depth += 1
+    
+    def pop(self, key: int) -> OutboundJob:
+        # Caller has just popped key's heap entry and must reschedule it if anything is left
+        queue = self.queues[key]
+        job = queue.popleft()
+        if not queue:
+            del self.queues[key]
+        self.depth -= 1
+        return job
+    
+    def __len__(self):
+        return self.depth
+
+class OutboundScheduler:
+    """Sends outgoing messages through per-channel and global token buckets, highest priority lane first"""
+    def __init__(self):
+        self.lanes = [OutboundLane() for _ in OUTBOUND_LANES]
+        self.global_bucket = TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_RATE)
+        self.channel_buckets = {}
+        self.coalescing = {}  # (priority, key) -> queued job that still accepts posts
+        self.wakeup = asyncio.Event()
+        self.slots = asyncio.Semaphore(OUTBOUND_CONCURRENCY)
+        self.task = None
+        self.in_flight = 0
+        self.metrics = [{"sent": 0, "coalesced": 0, "errors": 0, "wait_total": 0.0, "wait_max": 0.0} for _ in OUTBOUND_LANES]
+    
+    def destination_key(self, destination) -> int:
+        return destination.channel.id if isinstance(destination, commands.Context) else destination.id
+    
+    def enqueue(self, job: OutboundJob) -> OutboundJob:
+        self.lanes[job.priority].push(job)
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return job
+    
+    async def submit(self, key: int, priority: int, factory):
+        # factory is called once the buckets allow it; returns whatever it returns
+        return await self.enqueue(OutboundJob(key, priority, factory=factory)).future
+    
+    async def send(self, destination, *args, priority: int = PRIORITY_REPLY, **kwargs):
+        return await self.submit(self.destination_key(destination), priority, lambda: destination.send(*args, **kwargs))
+    
+    def post(self, destination, content: str = None, embed: discord.Embed = None, priority: int = PRIORITY_ANNOUNCEMENT):
+        # Fire-and-forget; posts to the same channel and lane are merged while they wait
+        key = self.destination_key(destination)
+        job = self.coalescing.get((priority, key))
+        if job is not None and (
+            len(job.embeds) + (embed is not None) > 10
+            or sum(len(text) + 1 for text in job.contents) + len(content or "") > 2000
+        ):
+            job = None
+        
+        if job is None:
+            job = self.enqueue(OutboundJob(key, priority, destination=destination))
+            job.future.add_done_callback(self.log_failure)
+            self.coalescing[(priority, key)] = job
+        else:
+            self.metrics[priority]["coalesced"] += 1
         
-        user_level_data["xp"] += amount
-        user_level_data["last_message"] = time.time()
+        if content:
+            job.contents.append(content)
+        if embed is not None:
+            job.embeds.append(embed)
+        return job.future
+    
+    def log_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Failed to deliver queued message: {future.exception()}")
+    
+    def next_job(self) -> tuple:
+        # Returns (job, None) or (None, seconds until something may be sendable)
+        now = time.monotonic()
+        wait = self.global_bucket.delay(now)
+        if wait > 0:
+            return None, wait
+        
+        # Heap times are lower bounds (another lane may have spent the bucket since), so each is rechecked
+        wait = None
+        for lane in self.lanes:
+            while lane.ready and lane.ready[0][0] <= now:
+                _, sequence, key = heapq.heappop(lane.ready)
+                bucket = self.channel_buckets.get(key)
+                if bucket is None:
+                    bucket = self.channel_buckets[key] = TokenBucket(OUTBOUND_CHANNEL_RATE, OUTBOUND_CHANNEL_BURST)
+                delay = bucket.delay(now)
+                if delay > 0:
+                    heapq.heappush(lane.ready, (now + delay, sequence, key))
+                    continue
+                
+                job = lane.pop(key)
+                bucket.take()
+                self.global_bucket.take()
+                if key in lane.queues:
+                    heapq.heappush(lane.ready, (now + bucket.delay(now), next(lane.sequence), key))
+                return job, None
+            if lane.ready:
+                delay = lane.ready[0][0] - now
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+    
+    async def run(self):
+        while True:
+            job, wait = self.next_job()
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            if self.coalescing.get((job.priority, job.key)) is job:
+                del self.coalescing[(job.priority, job.key)]
+            await self.slots.acquire()
+            self.in_flight += 1
+            asyncio.create_task(self.deliver(job))
+    
+    async def deliver(self, job: OutboundJob):
+        metrics = self.metrics[job.priority]
+        waited = time.monotonic() - job.enqueued_at
+        metrics["wait_total"] += waited
+        metrics["wait_max"] = max(metrics["wait_max"], waited)
+        try:
+            if job.factory is not None:
+                result = await job.factory()
+            else:
+                result = await job.destination.send(content="\n".join(job.contents) or None, embeds=job.embeds or None)
+            metrics["sent"] += 1
+            job.future.set_result(result)
+        except Exception as e:
+            metrics["errors"] += 1
+            job.future.set_exception(e)
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+            if len(self.channel_buckets) > OUTBOUND_BUCKETS_MAX:
+                self.prune_buckets()
     
-    # Calculate level
-    current_level = user_level_data["level"]
-    new_level = int(0.1 * (user_level_data["xp"] ** 0.5))
+    def prune_buckets(self):
+        # Full buckets carry no state worth keeping
+        now = time.monotonic()
+        queued = {key for lane in self.lanes for key in lane.queues}
+        for key in [key for key, bucket in self.channel_buckets.items() if key not in queued and bucket.delay(now) == 0 and bucket.tokens >= bucket.capacity]:
+            del self.channel_buckets[key]
     
-    user_level_data["level"] = new_level
-    await db.update_level(user.id, guild.id, user_level_data)
+    def stats(self) -> dict:
+        stats = {}
+        for name, lane, metrics in zip(OUTBOUND_LANES, self.lanes, self.metrics):
+            stats[name] = {
+                "depth": len(lane),
+                "sent": metrics["sent"],
+                "coalesced": metrics["coalesced"],
+                "errors": metrics["errors"],
+                "avg_wait_ms": metrics["wait_total"] / metrics["sent"] * 1000 if metrics["sent"] else 0.0,
+                "max_wait_ms": metrics["wait_max"] * 1000
+            }
+        stats["in_flight"] = self.in_flight
+        return stats
+
+outbound = OutboundScheduler()
+
+class ScheduledContext(commands.Context):
+    """Command context whose replies go through the outbound scheduler"""
+    async def send(self, *args, **kwargs):
+        send = super().send
+        return await outbound.submit(self.channel.id, PRIORITY_REPLY, lambda: send(*args, **kwargs))
+
+# Discord API Worker Pool
+class BoundedWorkerPool:
+    """Runs one Discord API call per item with bounded concurrency, backing off per rate-limit bucket on a 429"""
+    def __init__(self, concurrency: int = MASS_ACTION_CONCURRENCY, max_retries: int = 3):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.resume_at = {}  # bucket -> monotonic resume time; None is the global bucket
+        self.rate_limits = 0
+    
+    async def call(self, action, item, bucket=None):
+        for attempt in range(self.max_retries + 1):
+            delay = max(self.resume_at.get(None, 0.0), self.resume_at.get(bucket, 0.0)) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await action(item)
+            except discord.RateLimited as e:
+                retry_after = e.retry_after
+                scope = bucket
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                headers = e.response.headers
+                retry_after = float(headers.get("Retry-After", 1))
+                is_global = headers.get("X-RateLimit-Global") == "true" or headers.get("X-RateLimit-Scope") == "global"
+                scope = None if is_global else bucket
+            
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Still rate limited after {self.max_retries} retries")
+            # Back off every worker sharing the bucket, not just the one that hit the limit
+            self.rate_limits += 1
+            self.resume_at[scope] = max(self.resume_at.get(scope, 0.0), time.monotonic() + retry_after)
+    
+    async def run(self, items, action, progress=None, bucket=None) -> tuple:
+        # Returns (succeeded, failed) where failed holds (item, exception) pairs;
+        # bucket maps an item to its rate-limit route key (None shares one bucket)
+        queue = deque(items)
+        succeeded = []
+        failed = []
+        
+        async def worker():
+            while queue:
+                item = queue.popleft()
+                try:
+                    await self.call(action, item, bucket(item) if bucket else None)
+                    succeeded.append(item)
+                except Exception as e:
+                    failed.append((item, e))
+                if progress is not None:
+                    # A failed status edit must not stop this worker while the others keep acting
+                    try:
+                        await progress(len(succeeded), len(failed))
+                    except Exception as e:
+                        logger.warning(f"Progress callback failed: {e}")
+        
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(queue)))))
+        return succeeded, failed
+
+# Permission Rollout
+async def apply_role_permissions(guild, role, permissions: dict, channels=None, progress=None, reason: str = None) -> dict:
+    # Merges permissions into role's overwrite on every channel and returns a summary
+    channels = list(guild.channels if channels is None else channels)
+    pending = []
+    for channel in channels:
+        current = channel.overwrites_for(role)
+        desired = discord.PermissionOverwrite(**dict(iter(current)))
+        desired.update(**permissions)
+        # Already applied, or inherited from the category when the channel was created
+        if desired != current:
+            pending.append((channel, desired))
+    
+    # Categories first, so channels created mid-rollout inherit the overwrite
+    pending.sort(key=lambda entry: not isinstance(entry[0], discord.CategoryChannel))
+    total = len(pending)
+    
+    async def apply(entry):
+        channel, overwrite = entry
+        await channel.set_permissions(role, overwrite=overwrite, reason=reason)
+    
+    async def report(done, failures):
+        nonlocal progress
+        if progress is None:
+            return
+        try:
+            await progress(done + failures, total)
+        except Exception as e:
+            # The rollout carries on without a status message rather than stopping halfway
+            logger.warning(f"Stopped reporting permission progress in guild {guild.id}: {e}")
+            progress = None
+    
+    pool = BoundedWorkerPool(PERMISSION_CONCURRENCY)
+    # The overwrite route is bucketed per channel
+    succeeded, failed = await pool.run(pending, apply, report, bucket=lambda entry: entry[0].id)
+    return {
+        "applied": len(succeeded),
+        "skipped": len(channels) - total,
+        "failed": [(channel, error) for (channel, _), error in failed],
+        "rate_limits": pool.rate_limits
+    }
+
+def format_permission_summary(summary: dict) -> str:
+    text = f"Updated {summary['applied']} channels, {summary['skipped']} already up to date."
+    if summary["failed"]:
+        text += f"\n**Failed ({len(summary['failed'])}):** " + ", ".join(
+            f"{channel.mention} ({type(error).__name__})" for channel, error in summary["failed"][:15]
+        )
+    return text
+
+# Moderation Log Dispatcher
+class ModerationLogDispatcher:
+    """Queues log embeds per channel and sends them in the background, up to 10 per message"""
+    def __init__(self):
+        self.queues = {}  # channel_id -> deque of (embed, file)
+        self.channels = {}
+        self.senders = {}
+        self.dropped = Counter()  # dropped since the last message to each channel
+        self.dropped_total = 0
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.retries = 0
+    
+    def dispatch(self, channel, embed: discord.Embed, file: discord.File = None):
+        queue = self.queues.setdefault(channel.id, deque())
+        if len(queue) >= LOG_QUEUE_MAX:
+            # Backpressure: shed the oldest entries rather than growing without bound
+            queue.popleft()
+            self.dropped[channel.id] += 1
+            self.dropped_total += 1
+        queue.append((embed, file))
+        self.channels[channel.id] = channel
+        
+        sender = self.senders.get(channel.id)
+        if sender is None or sender.done():
+            self.senders[channel.id] = asyncio.create_task(self.drain(channel.id))
+    
+    def next_batch(self, queue) -> tuple:
+        # Discord allows 10 embeds and 6000 embed characters per message; files go out on their own message
+        embeds = []
+        size = 0
+        while queue and len(embeds) < 10:
+            embed, file = queue[0]
+            if file is not None:
+                if not embeds:
+                    queue.popleft()
+                    return [embed], file
+                break
+            if embeds and size + len(embed) > 6000:
+                break
+            queue.popleft()
+            embeds.append(embed)
+            size += len(embed)
+        return embeds, None
+    
+    async def drain(self, channel_id: int):
+        await asyncio.sleep(LOG_DEBOUNCE)
+        queue = self.queues[channel_id]
+        channel = self.channels[channel_id]
+        while queue:
+            embeds, file = self.next_batch(queue)
+            content = None
+            if self.dropped[channel_id]:
+                content = f"⚠️ {self.dropped.pop(channel_id)} log entries were dropped because the log channel fell behind."
+            if not await self.send(channel, content, embeds, file):
+                queue.clear()
+                break
+        self.queues.pop(channel_id, None)
+        self.channels.pop(channel_id, None)
+    
+    async def send(self, channel, content, embeds, file) -> bool:
+        for attempt in range(LOG_MAX_RETRIES):
+            try:
+                await outbound.send(channel, content=content, embeds=embeds, file=file, priority=PRIORITY_LOG)
+                self.sent_messages += 1
+                self.sent_embeds += len(embeds)
+                return True
+            except (discord.Forbidden, discord.NotFound) as e:
+                logger.warning(f"Dropping moderation logs for channel {channel.id}: {e}")
+                return False
+            except discord.HTTPException as e:
+                if e.status < 500 and e.status != 429:
+                    logger.error(f"Moderation log rejected by channel {channel.id}: {e}")
+                    return True
+                self.retries += 1
+                if file is not None:
+                    file.reset()
+                await asyncio.sleep(2 ** attempt)
+        logger.error(f"Gave up sending {len(embeds)} moderation logs to channel {channel.id}")
+        return True
+    
+    async def close(self):
+        senders = [sender for sender in self.senders.values() if not sender.done()]
+        if senders:
+            await asyncio.gather(*senders, return_exceptions=True)
+    
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(queue) for queue in self.queues.values()),
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+            "dropped": self.dropped_total,
+            "retries": self.retries
+        }
+
+log_dispatcher = ModerationLogDispatcher()
+
+# Utility Functions
+async def add_xp(user, guild, amount=None, context=None):
+    if amount is None:
+        amount = random.randint(5, 15)
+    
+    # XP is accumulated in memory and flushed in bulk by flush_level_buffer
+    result = await db.add_level_xp(user.id, guild.id, amount)
+    if result is None:
+        return  # Still on cooldown
+    
+    db.increment_guild_stats(guild.id, "xp", amount)
+    current_level, new_level = result
     
     # Level up message
     if new_level > current_level:
-        guild_data = await db.get_guild(guild.id)
+        guild_data = await context.guild_config() if context else await db.get_guild(guild.id)
         level_channel_id = guild_data.get("level_channel") if guild_data else None
         
         if level_channel_id:
@@ -389,24 +1877,22 @@ async def add_xp(user, guild, amount=None):
                     description=f"{user.mention} has reached level **{new_level}**!",
                     color=SUCCESS_COLOR
                 )
-                await channel.send(embed=embed)
+                outbound.post(channel, embed=embed, priority=PRIORITY_ANNOUNCEMENT)
 
-async def check_afk(message):
+async def check_afk(message, context=None):
+    # The AFK registry answers from memory, so only AFK users cost a database call
     # Check if the author is AFK
-    author_data = await db.get_user(message.author.id)
-    if author_data and author_data.get("afk"):
-        await db.update_user(message.author.id, {"afk": None})
-        try:
-            await message.channel.send(f"Welcome back {message.author.mention}! Your AFK status has been removed.")
-        except:
-            pass
+    author_afk = await context.author_afk() if context else await db.get_afk(message.author.id)
+    if author_afk:
+        await db.clear_afk(message.author.id)
+        outbound.post(message.channel, f"Welcome back {message.author.mention}! Your AFK status has been removed.", priority=PRIORITY_NOTICE)
     
     # Check for mentioned users who are AFK
     for mention in message.mentions:
-        user_data = await db.get_user(mention.id)
-        if user_data and user_data.get("afk"):
-            afk_time = user_data["afk"]["time"]
-            afk_reason = user_data["afk"]["reason"]
+        afk = await db.get_afk(mention.id)
+        if afk:
+            afk_time = afk["time"]
+            afk_reason = afk["reason"]
             time_ago = humanfriendly.format_timespan(time.time() - afk_time)
             
             embed = discord.Embed(
@@ -414,30 +1900,300 @@ async def check_afk(message):
                 description=f"{mention.display_name} is AFK: {afk_reason} - {time_ago} ago",
                 color=WARNING_COLOR
             )
-            await message.channel.send(embed=embed)
+            outbound.post(message.channel, embed=embed, priority=PRIORITY_NOTICE)
+
+# Asset Cache
+class AssetCache:
+    """Two-tier cache for downloaded assets: an in-memory LRU bounded by bytes over a size-bounded disk cache"""
+    def __init__(self, directory: str = ASSET_CACHE_DIR, memory_bytes: int = ASSET_MEMORY_CACHE_BYTES, disk_bytes: int = ASSET_DISK_CACHE_BYTES):
+        self.directory = directory
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.max_memory_bytes = memory_bytes
+        self.disk = None  # file name -> size in LRU order, loaded on first use
+        self.disk_bytes = 0
+        self.max_disk_bytes = disk_bytes
+        self.disk_lock = asyncio.Lock()
+        self.pending = SharedTasks()
+        self.counters = Counter()
+    
+    def remember(self, url: str, data: bytes):
+        # Items over an eighth of the budget would evict too much to be worth holding
+        if len(data) > self.max_memory_bytes // 8:
+            return
+        if url in self.memory:
+            self.memory_bytes -= len(self.memory.pop(url))
+        self.memory[url] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.counters["memory_evictions"] += 1
+    
+    def file_name(self, url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+    
+    def load_disk_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self.disk = OrderedDict((name, size) for _, name, size in entries)
+        self.disk_bytes = sum(self.disk.values())
+    
+    def read_disk(self, name: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)  # keeps LRU order across restarts
+            return data
+        except FileNotFoundError:
+            return None
+    
+    def write_disk(self, name: str, data: bytes):
+        # Written aside and renamed so a reader never sees a partial file
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+    
+    def remove_disk(self, evict: List[str]):
+        for evicted in evict:
+            try:
+                os.remove(os.path.join(self.directory, evicted))
+            except FileNotFoundError:
+                pass
+    
+    async def from_disk(self, url: str) -> Optional[bytes]:
+        async with self.disk_lock:
+            if self.disk is None:
+                await asyncio.to_thread(self.load_disk_index)
+            name = self.file_name(url)
+            if name not in self.disk:
+                return None
+            self.disk.move_to_end(name)
+        
+        data = await asyncio.to_thread(self.read_disk, name)
+        if data is None:
+            async with self.disk_lock:
+                self.disk_bytes -= self.disk.pop(name, 0)
+        return data
+    
+    async def to_disk(self, url: str, data: bytes):
+        if len(data) > self.max_disk_bytes:
+            return
+        async with self.disk_lock:
+            if self.disk is None:
+                await asyncio.to_thread(self.load_disk_index)
+        
+        # Only indexed once the file is in place, so from_disk never finds a name it cannot read
+        name = self.file_name(url)
+        await asyncio.to_thread(self.write_disk, name, data)
+        async with self.disk_lock:
+            self.disk_bytes -= self.disk.pop(name, 0)
+            self.disk[name] = len(data)
+            self.disk_bytes += len(data)
+            
+            evict = []
+            while self.disk_bytes > self.max_disk_bytes:
+                evicted, size = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                evict.append(evicted)
+            self.counters["disk_evictions"] += len(evict)
+        if evict:
+            await asyncio.to_thread(self.remove_disk, evict)
+    
+    async def download(self, url: str) -> bytes:
+        async with bot.http_session.get(url) as response:
+            response.raise_for_status()
+            if (response.content_length or 0) > ASSET_MAX_BYTES:
+                raise ValueError(f"Asset {url} is larger than {ASSET_MAX_BYTES} bytes")
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(65536):
+                data.extend(chunk)
+                if len(data) > ASSET_MAX_BYTES:
+                    raise ValueError(f"Asset {url} is larger than {ASSET_MAX_BYTES} bytes")
+            data = bytes(data)
+        self.counters["downloads"] += 1
+        self.counters["downloaded_bytes"] += len(data)
+        return data
+    
+    async def load(self, url: str) -> bytes:
+        data = await self.from_disk(url)
+        if data is not None:
+            self.counters["disk_hits"] += 1
+        else:
+            data = await self.download(url)
+            try:
+                await self.to_disk(url, data)
+            except OSError as e:
+                logger.warning(f"Failed to write {url} to the asset cache: {e}")
+        self.remember(url, data)
+        return data
+    
+    async def fetch(self, url: str) -> bytes:
+        data = self.memory.get(url)
+        if data is not None:
+            self.memory.move_to_end(url)
+            self.counters["memory_hits"] += 1
+            return data
+        
+        # Concurrent requests for the same URL share one disk read or download
+        return await self.pending.run(url, lambda: self.load(url))
+    
+    def stats(self) -> dict:
+        return {
+            "memory_items": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_items": len(self.disk) if self.disk is not None else None,
+            "disk_bytes": self.disk_bytes,
+            "deduplicated": self.pending.shared,
+            **self.counters
+        }
+
+asset_cache = AssetCache()
+
+# Rank Cards
+class RankCardRenderer:
+    """Renders rank cards in a process pool, caching PNGs by (user, avatar, level, XP bucket)"""
+    def __init__(self, workers: int = RANK_CARD_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.cache = LRUCache(RANK_CARD_CACHE_SIZE)
+        self.pending = SharedTasks()
+        self.rendered = 0
+    
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(RANK_CARD_START_METHOD),
+                initializer=init_rank_card_worker,
+                initargs=(RANK_CARD_FONT,)
+            )
+    
+    def pool(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            raise RuntimeError("Rank card workers have not been started")
+        return self.executor
+    
+    async def render_bytes(self, name: str, avatar: Optional[bytes], level: int, progress: float, progress_text: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.pool(), generate_level_image, name, avatar, level, progress, progress_text)
+        self.rendered += 1
+        return data
+    
+    async def render(self, member, level_data: dict) -> BytesIO:
+        xp = level_data.get("xp", 0)
+        level = level_data.get("level", 0)
+        floor_xp = 100 * level ** 2
+        next_level_xp = 100 * (level + 1) ** 2
+        progress = min(1.0, max(0.0, (xp - floor_xp) / (next_level_xp - floor_xp)))
+        bucket = int(progress * RANK_CARD_XP_BUCKETS)
+        key = (member.id, member.display_avatar.key, level, bucket, member.display_name)
+        
+        data = self.cache.get(key)
+        if data is None:
+            # Concurrent requests for the same card share one render
+            data = await self.pending.run(key, lambda: self.render_member(member, level, bucket / RANK_CARD_XP_BUCKETS))
+            self.cache.put(key, data)
+        return BytesIO(data)
+    
+    async def render_member(self, member, level: int, progress: float) -> bytes:
+        avatar = await asset_cache.fetch(str(member.display_avatar.replace(size=128, format="png").url))
+        return await self.render_bytes(member.display_name, avatar, level, progress, f"{int(progress * 100)}%")
+    
+    async def benchmark(self, count: int = 200) -> dict:
+        # Renders uncached synthetic cards through the pool and reports throughput
+        await self.render_bytes("warmup", None, 1, 0.5, "50%")
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            self.render_bytes(f"Benchmark {i}", None, i % 100, (i % RANK_CARD_XP_BUCKETS) / RANK_CARD_XP_BUCKETS, f"{i % 100}%")
+            for i in range(count)
+        ))
+        elapsed = time.perf_counter() - start
+        return {"cards": count, "workers": self.workers, "seconds": elapsed, "cards_per_second": count / elapsed}
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
 
-def generate_level_image(user, level_data):
-    # This would create a fancy level card image
-    # For brevity, I'll just outline the logic
-    background = Image.new('RGBA', (500, 150), (44, 47, 51, 255))
-    draw = ImageDraw.Draw(background)
+rank_cards = RankCardRenderer()
+
+# Server Stats Charts
+class StatsChartRenderer:
+    """Charts a guild's hourly activity buckets off the event loop, reusing each (guild, period) chart for STATS_CHART_TTL"""
+    def __init__(self, ttl: float = STATS_CHART_TTL):
+        self.ttl = ttl
+        self.cache = LRUCache(STATS_CHART_CACHE_SIZE)
+        self.pending = SharedTasks()
+        self.rendered = 0
+    
+    async def series(self, guild_id: int, period: str) -> tuple:
+        # Rolls the stored hourly buckets up into one point per step, zero-filling quiet periods
+        span, step = STATS_CHART_RANGES[period]
+        until = (int(time.time()) // step + 1) * step
+        since = until - span
+        points = span // step
+        
+        series = {name: [0] * points for name in STATS_CHART_SERIES}
+        for bucket in await db.get_guild_stats_history(guild_id, since, until):
+            bucket_time = bucket["timestamp"].replace(tzinfo=datetime.timezone.utc).timestamp()
+            index = int((bucket_time - since) // step)
+            if 0 <= index < points:
+                for name in STATS_CHART_SERIES:
+                    series[name][index] += bucket.get(name, 0)
+        
+        timestamps = [datetime.datetime.utcfromtimestamp(since + i * step) for i in range(points)]
+        return timestamps, series
     
-    # Draw user avatar
-    # Draw XP bar
-    # Draw level text
-    # Add username
+    async def render(self, guild, period: str) -> tuple:
+        key = (guild.id, period)
+        entry = self.cache.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            # Concurrent requests for the same chart share one render
+            data, totals = await self.pending.run(key, lambda: self.render_guild(guild, period))
+            entry = (time.monotonic() + self.ttl, data, totals)
+            self.cache.put(key, entry)
+        return BytesIO(entry[1]), entry[2]
+    
+    async def render_guild(self, guild, period: str) -> tuple:
+        timestamps, series = await self.series(guild.id, period)
+        date_format = "%H:%M" if period == "24h" else "%b %d"
+        loop = asyncio.get_running_loop()
+        # Charts share the rank card worker processes
+        data = await loop.run_in_executor(
+            rank_cards.pool(), generate_stats_chart,
+            f"{guild.name} - last {period}", timestamps, series, date_format
+        )
+        self.rendered += 1
+        return data, {name: sum(values) for name, values in series.items()}
     
-    buffer = BytesIO()
-    background.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+    def stats(self) -> dict:
+        return dict(self.cache.stats(), rendered=self.rendered)
 
-# Help Command
-bot.remove_command('help')  # Remove default help command
+stats_charts = StatsChartRenderer()
 
-@bot.group(invoke_without_command=True)
-async def help(ctx, command=None):
-    """Shows help about the bot, a command, or a category"""
+# Render Cache
+class RenderCache(LRUCache):
+    """Bounded LRU of prebuilt embeds keyed by (kind, guild, premium status, content version)"""
+    def get_or_build(self, key: tuple, build):
+        # Cached embeds are shared between callers and must not be mutated
+        embed = self.get(key)
+        if embed is None:
+            embed = build()
+            self.put(key, embed)
+        return embed
+
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+
+def build_help_embed(command=None):
     if command is None:
         embed = discord.Embed(
             title=f"{bot.user.name} Help",
@@ -464,26 +2220,26 @@ async def help(ctx, command=None):
             )
             
         embed.set_footer(text="Use !help <command> to get more info on a specific command")
-        await ctx.send(embed=embed)
+        return embed
     else:
         cmd = bot.get_command(command)
         if cmd:
             embed = discord.Embed(
-                title=f"Command: {cmd.name}",
+                title=f"Command: {cmd.qualified_name}",
                 description=cmd.help or "No description available",
                 color=EMBED_COLOR
             )
             
             # Add usage, aliases, etc.
             if cmd.usage:
-                embed.add_field(name="Usage", value=f"`!{cmd.name} {cmd.usage}`", inline=False)
+                embed.add_field(name="Usage", value=f"`!{cmd.qualified_name} {cmd.usage}`", inline=False)
             else:
-                embed.add_field(name="Usage", value=f"`!{cmd.name}`", inline=False)
+                embed.add_field(name="Usage", value=f"`!{cmd.qualified_name}`", inline=False)
                 
             if cmd.aliases:
                 embed.add_field(name="Aliases", value=", ".join([f"`{alias}`" for alias in cmd.aliases]), inline=False)
                 
-            await ctx.send(embed=embed)
+            return embed
         else:
             # Check if it's a category
             category = command.capitalize()
@@ -510,14 +2266,67 @@ async def help(ctx, command=None):
                 else:
                     embed.description = "No commands found in this category."
                 
-                await ctx.send(embed=embed)
+                return embed
             else:
                 embed = discord.Embed(
                     title="Command Not Found",
                     description=f"Command or category `{command}` not found.\nUse `!help` to see all commands.",
                     color=ERROR_COLOR
                 )
-                await ctx.send(embed=embed)
+                return embed
+
+# Shop Catalog
+class ShopCatalog:
+    """Compiled shop: items by ID plus price-sorted display pages with and without premium items"""
+    def __init__(self, items: List[dict], version: int = None):
+        self.version = version  # _version of the guild document the items came from
+        self.items = {item["id"]: item for item in items}
+        ordered = sorted(self.items.values(), key=lambda item: (item["price"], item["name"].lower()))
+        self.pages = {
+            True: self.paginate(ordered),
+            False: self.paginate([item for item in ordered if not item.get("premium", False)])
+        }
+    
+    def paginate(self, items: List[dict]) -> List[List[dict]]:
+        return [items[start:start + SHOP_PAGE_SIZE] for start in range(0, len(items), SHOP_PAGE_SIZE)] or [[]]
+    
+    def get(self, item_id: str) -> Optional[dict]:
+        return self.items.get(item_id)
+    
+    def page(self, page: int, is_premium: bool) -> List[dict]:
+        return self.pages[is_premium][page - 1]
+    
+    def page_count(self, is_premium: bool) -> int:
+        return len(self.pages[is_premium])
+
+DEFAULT_SHOP_CATALOG = ShopCatalog(DEFAULT_SHOP_ITEMS)
+shop_catalogs = LRUCache(GUILD_CACHE_SIZE)
+
+def get_shop_catalog(guild_id: int, guild_data: dict) -> ShopCatalog:
+    # Keyed on the guild document's _version, which every write bumps, including
+    # writes from other instances that arrive through the change stream
+    if "shop_items" not in guild_data:
+        return DEFAULT_SHOP_CATALOG
+    version = guild_data.get("_version")
+    catalog = shop_catalogs.get(guild_id)
+    if catalog is None or catalog.version != version:
+        catalog = ShopCatalog(guild_data["shop_items"], version)
+        shop_catalogs.put(guild_id, catalog)
+    return catalog
+
+# Help Command
+bot.remove_command('help')  # Remove default help command
+
+@bot.group(invoke_without_command=True)
+async def help(ctx, command=None):
+    """Shows help about the bot, a command, or a category"""
+    # Help output only changes with the command set; the key and the embed both use the
+    # resolved command name, so differently cased requests share one correctly titled embed
+    if command is not None:
+        cmd = bot.get_command(command)
+        command = cmd.qualified_name if cmd else command.lower()
+    key = ("help", command, bot.command_version)
+    await ctx.send(embed=render_cache.get_or_build(key, lambda: build_help_embed(command)))
 
 # General Commands
 @bot.command()
@@ -535,7 +2344,7 @@ async def ping(ctx):
     embed.add_field(name="Response Time", value=f"{response_time}ms", inline=True)
     
     await message.edit(content=None, embed=embed)
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def info(ctx):
@@ -569,7 +2378,35 @@ async def info(ctx):
     embed.set_thumbnail(url=bot.user.avatar.url)
     
     await ctx.send(embed=embed)
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
+
+@bot.command(aliases=["activity"])
+async def serverstats(ctx, period: str = "24h"):
+    """Chart the server's messages, joins and XP over time"""
+    try:
+        period = period.lower()
+        if period not in STATS_CHART_RANGES:
+            await ctx.send(f"❌ Period must be one of: {', '.join(STATS_CHART_RANGES)}")
+            return
+        
+        chart, totals = await stats_charts.render(ctx.guild, period)
+        
+        embed = discord.Embed(
+            title=f"📊 {ctx.guild.name} Activity",
+            description=f"Server activity over the last **{period}**",
+            color=EMBED_COLOR
+        )
+        embed.add_field(name="Messages", value=f"{totals['messages']:,}", inline=True)
+        embed.add_field(name="Joins", value=f"{totals['joins']:,}", inline=True)
+        embed.add_field(name="XP Earned", value=f"{totals['xp']:,}", inline=True)
+        embed.set_image(url="attachment://serverstats.png")
+        embed.set_footer(text=f"Updates every {STATS_CHART_TTL // 60} minutes")
+        await ctx.send(embed=embed, file=discord.File(chart, filename="serverstats.png"))
+        
+    except Exception as e:
+        await ctx.send(f"❌ Error generating server stats: {e}")
+    
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def invite(ctx):
@@ -601,7 +2438,48 @@ async def invite(ctx):
     embed.add_field(name="⭐ Premium", value="Use `!premium` to check out premium features!", inline=False)
     
     await ctx.send(embed=embed)
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def dbstats(ctx, method: str = None):
+    """Show latency percentiles for database round trips"""
+    try:
+        if method is not None:
+            data = db.metrics.snapshot(method)
+            if not data:
+                await ctx.send(f"❌ No round trips recorded for `{method}`.")
+                return
+            rows = [(method, data)]
+        else:
+            rows = db.metrics.slowest(limit=20)
+        
+        uptime = humanfriendly.format_timespan(time.time() - db.metrics.started, max_units=2)
+        embed = discord.Embed(
+            title="🗄️ Database Latency",
+            description=f"Storage: `{db.storage.name}` • Round trips only, cache hits excluded • Recorded over {uptime} • Sorted by total time",
+            color=EMBED_COLOR
+        )
+        
+        for name, data in rows:
+            embed.add_field(
+                name=name,
+                value=(
+                    f"p50 `{data['p50_ms']:.1f}ms` • p95 `{data['p95_ms']:.1f}ms` • p99 `{data['p99_ms']:.1f}ms`\n"
+                    f"{data['calls']:,} calls • {data['errors']} errors • {data['in_flight']} in flight • "
+                    f"~{humanfriendly.format_size(data['avg_payload_bytes'])}"
+                ),
+                inline=False
+            )
+        
+        if not rows:
+            embed.add_field(name="No data", value="No database calls recorded yet.", inline=False)
+        
+        await ctx.send(embed=embed)
+    except Exception as e:
+        await ctx.send(f"❌ Error reading database stats: {e}")
+    
+    db.increment_stats("commands_used")
 
 @bot.command()
 @commands.has_permissions(administrator=True)
@@ -747,18 +2625,29 @@ async def moderation_setup(ctx):
             mute_role = await ctx.guild.create_role(name="Muted", reason="Automatically created by bot setup")
             
             # Update channel permissions
-            for channel in ctx.guild.channels:
-                try:
-                    await channel.set_permissions(mute_role, send_messages=False, add_reactions=False)
-                except:
-                    pass
+            status = await ctx.send(f"⏳ Applying mute role permissions to {len(ctx.guild.channels)} channels...")
+            last_update = time.monotonic()
+            async def progress(done, total):
+                nonlocal last_update
+                if time.monotonic() - last_update >= 3:
+                    last_update = time.monotonic()
+                    await status.edit(content=f"⏳ Applying mute role permissions... {done}/{total}")
+            
+            summary = await apply_role_permissions(
+                ctx.guild, mute_role, MUTE_ROLE_PERMISSIONS,
+                progress=progress, reason="Automatically created by bot setup"
+            )
+            await status.edit(content=format_permission_summary(summary))
             
             mute_role_id = mute_role.id
+            mute_role_managed = True
         elif msg.role_mentions:
             mute_role_id = msg.role_mentions[0].id
+            mute_role_managed = False
         else:
             await ctx.send("❌ No role mentioned or 'create' specified. Using default settings.")
             mute_role_id = None
+            mute_role_managed = False
         
         # Update guild settings
         guild_data = await db.get_guild(ctx.guild.id) or {}
@@ -767,6 +2656,7 @@ async def moderation_setup(ctx):
             
         guild_data["moderation"]["log_channel"] = log_channel
         guild_data["moderation"]["mute_role"] = mute_role_id
+        guild_data["moderation"]["mute_role_managed"] = mute_role_managed
         
         await db.update_guild(ctx.guild.id, guild_data)
         
@@ -1012,7 +2902,7 @@ async def tickets_setup(ctx):
         ticket_button = discord.ui.Button(label="Create Ticket", style=discord.ButtonStyle.primary, emoji="🎫", custom_id="create_ticket")
         ticket_view.add_item(ticket_button)
         
-        panel_message = await ticket_channel.send(embed=ticket_embed, view=ticket_view)
+        panel_message = await outbound.send(ticket_channel, embed=ticket_embed, view=ticket_view)
         
         # Update guild settings
         guild_data = await db.get_guild(ctx.guild.id) or {}
@@ -1052,9 +2942,7 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
     try:
         # Create moderation case
         guild_data = await db.get_guild(ctx.guild.id) or {}
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1075,7 +2963,7 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
                 description=f"**Reason:** {reason}\n**Case ID:** {case_count}",
                 color=ERROR_COLOR
             )
-            await member.send(embed=embed)
+            await outbound.send(member, embed=embed, priority=PRIORITY_DM)
         except:
             pass  # Member might have DMs disabled
         
@@ -1101,13 +2989,13 @@ async def kick(ctx, member: discord.Member, *, reason="No reason provided"):
                     timestamp=datetime.datetime.utcnow()
                 )
                 log_embed.set_thumbnail(url=member.display_avatar.url)
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
     except Exception as e:
         await ctx.send(f"❌ Error kicking member: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("members_kicked")
+    db.increment_stats("commands_used")
+    db.increment_stats("members_kicked")
 
 @bot.command()
 @commands.has_permissions(ban_members=True)
@@ -1124,9 +3012,7 @@ async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
     try:
         # Create moderation case
         guild_data = await db.get_guild(ctx.guild.id) or {}
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1147,7 +3033,7 @@ async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
                 description=f"**Reason:** {reason}\n**Case ID:** {case_count}",
                 color=ERROR_COLOR
             )
-            await member.send(embed=embed)
+            await outbound.send(member, embed=embed, priority=PRIORITY_DM)
         except:
             pass  # Member might have DMs disabled
         
@@ -1173,13 +3059,13 @@ async def ban(ctx, member: discord.Member, *, reason="No reason provided"):
                     timestamp=datetime.datetime.utcnow()
                 )
                 log_embed.set_thumbnail(url=member.display_avatar.url)
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
     except Exception as e:
         await ctx.send(f"❌ Error banning member: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("members_banned")
+    db.increment_stats("commands_used")
+    db.increment_stats("members_banned")
 
 @bot.command()
 @commands.has_permissions(ban_members=True)
@@ -1187,11 +3073,7 @@ async def unban(ctx, user_id: int, *, reason="No reason provided"):
     """Unban a user by their ID"""
     try:
         # Check if user is banned
-        ban_entry = None
-        async for entry in ctx.guild.bans():
-            if entry.user.id == user_id:
-                ban_entry = entry
-                break
+        ban_entry = await fetch_ban_entry(ctx.guild, user_id)
         
         if not ban_entry:
             await ctx.send("❌ This user is not banned.")
@@ -1199,9 +3081,7 @@ async def unban(ctx, user_id: int, *, reason="No reason provided"):
         
         # Create moderation case
         guild_data = await db.get_guild(ctx.guild.id) or {}
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1218,30 +3098,302 @@ async def unban(ctx, user_id: int, *, reason="No reason provided"):
         # Unban the user
         await ctx.guild.unban(ban_entry.user, reason=f"{reason} - By {ctx.author}")
         
-        # Send confirmation
+        # Send confirmation
+        embed = discord.Embed(
+            title="✅ User Unbanned",
+            description=f"{ban_entry.user.mention} ({ban_entry.user.id}) has been unbanned from the server.\n**Reason:** {reason}\n**Case ID:** {case_count}",
+            color=SUCCESS_COLOR
+        )
+        await ctx.send(embed=embed)
+        
+        # Log the action
+        if "moderation" in guild_data and guild_data["moderation"].get("log_channel"):
+            log_channel = bot.get_channel(guild_data["moderation"]["log_channel"])
+            if log_channel:
+                log_embed = discord.Embed(
+                    title=f"User Unbanned | Case #{case_count}",
+                    description=f"**User:** {ban_entry.user} ({ban_entry.user.id})\n**Moderator:** {ctx.author.mention}\n**Reason:** {reason}",
+                    color=SUCCESS_COLOR,
+                    timestamp=datetime.datetime.utcnow()
+                )
+                log_dispatcher.dispatch(log_channel, log_embed)
+                
+    except Exception as e:
+        await ctx.send(f"❌ Error unbanning user: {e}")
+    
+    db.increment_stats("commands_used")
+
+@bot.command()
+@commands.has_permissions(ban_members=True)
+async def banlist(ctx, page: int = 1):
+    """List banned users"""
+    try:
+        if not BAN_INDEX_ENABLED:
+            await ctx.send("❌ The ban index is disabled.")
+            return
+        
+        bans = await ban_index.load(ctx.guild)
+        pages = max(1, (len(bans) + BANLIST_PAGE_SIZE - 1) // BANLIST_PAGE_SIZE)
+        page = min(max(page, 1), pages)
+        start = (page - 1) * BANLIST_PAGE_SIZE
+        entries = itertools.islice(bans.items(), start, start + BANLIST_PAGE_SIZE)
+        
+        embed = discord.Embed(
+            title=f"🔨 Bans in {ctx.guild.name}",
+            description="\n".join(
+                f"<@{user_id}> (`{user_id}`) — {reason or 'No reason recorded'}"
+                for user_id, reason in entries
+            ) or "No one is banned.",
+            color=EMBED_COLOR
+        )
+        embed.set_footer(text=f"Page {page}/{pages} • {len(bans)} bans")
+        await ctx.send(embed=embed)
+    except Exception as e:
+        await ctx.send(f"❌ Error listing bans: {e}")
+    
+    db.increment_stats("commands_used")
+
+async def resolve_mass_targets(ctx, arguments: str) -> tuple:
+    # Splits "<ids/mentions...> [joined:<minutes>] [reason...]" into (user_ids, reason)
+    user_ids = []
+    joined_within = None
+    words = arguments.split()
+    while words:
+        word = words[0]
+        match = re.fullmatch(r"<@!?(\d+)>|(\d{15,20})", word)
+        if match:
+            user_ids.append(int(match.group(1) or match.group(2)))
+        elif word.lower().startswith("joined:") and word[7:].isdigit():
+            joined_within = int(word[7:])
+        else:
+            break
+        words.pop(0)
+    
+    if joined_within is not None:
+        cutoff = discord.utils.utcnow() - datetime.timedelta(minutes=joined_within)
+        user_ids.extend(member.id for member in ctx.guild.members if member.joined_at and member.joined_at >= cutoff)
+    
+    reason = " ".join(words) or "No reason provided"
+    return list(dict.fromkeys(user_ids)), reason
+
+async def run_mass_action(ctx, action: str, arguments: str):
+    user_ids, reason = await resolve_mass_targets(ctx, arguments)
+    
+    # Drop anyone the single-target commands would refuse
+    targets = []
+    skipped = 0
+    for user_id in user_ids:
+        member = ctx.guild.get_member(user_id)
+        if user_id in (ctx.author.id, ctx.guild.owner_id, bot.user.id):
+            skipped += 1
+        elif member is not None and (
+            (member.top_role >= ctx.author.top_role and ctx.author != ctx.guild.owner)
+            or member.top_role >= ctx.guild.me.top_role
+        ):
+            skipped += 1
+        elif member is None and action == "kick":
+            skipped += 1
+        elif action == "ban" and ban_index.is_banned(ctx.guild.id, user_id):
+            skipped += 1
+        else:
+            targets.append(member or discord.Object(id=user_id))
+    
+    if not targets:
+        await ctx.send(f"❌ No valid members to {action}. Pass IDs, mentions or `joined:<minutes>`.")
+        return 0
+    if len(targets) > MASS_ACTION_MAX_TARGETS:
+        await ctx.send(f"❌ You can {action} at most {MASS_ACTION_MAX_TARGETS} members at once.")
+        return 0
+    
+    verb = "banned" if action == "ban" else "kicked"
+    embed = discord.Embed(
+        title=f"⚠️ Confirm Mass {action.title()}",
+        description=f"{len(targets)} members will be {verb}.\n**Reason:** {reason}\n\nReact with ✅ to continue or ❌ to cancel.",
+        color=WARNING_COLOR
+    )
+    if skipped:
+        embed.set_footer(text=f"{skipped} targets skipped (yourself, the owner, the bot, higher roles, already banned or not in the server)")
+    status = await ctx.send(embed=embed)
+    await status.add_reaction("✅")
+    await status.add_reaction("❌")
+    
+    try:
+        reaction, user = await bot.wait_for(
+            "reaction_add",
+            check=lambda r, u: u == ctx.author and str(r.emoji) in ("✅", "❌") and r.message.id == status.id,
+            timeout=30.0
+        )
+    except asyncio.TimeoutError:
+        await status.edit(content="Mass action timed out.", embed=None)
+        return 0
+    if str(reaction.emoji) == "❌":
+        await status.edit(content="Mass action cancelled.", embed=None)
+        return 0
+    
+    audit_reason = f"{reason} - By {ctx.author} (mass {action})"
+    if action == "ban":
+        async def act(target):
+            await ctx.guild.ban(target, reason=audit_reason, delete_message_seconds=86400)
+    else:
+        async def act(target):
+            await ctx.guild.kick(target, reason=audit_reason)
+    
+    # Cases are written in batches as actions succeed, so a failed insert or a restart
+    # mid-run leaves at most one batch of completed actions without a case
+    completed = []  # actioned targets without a case ID yet
+    unwritten = []  # cases with IDs whose insert has not succeeded yet
+    cases = []
+    case_lock = asyncio.Lock()
+    
+    async def record_cases(final: bool = False):
+        async with case_lock:
+            if len(completed) + len(unwritten) < (1 if final else MASS_ACTION_CASE_BATCH):
+                return
+            if completed:
+                batch = completed[:]
+                case_ids = await db.allocate_case_ids(ctx.guild.id, len(batch))
+                del completed[:len(batch)]
+                timestamp = datetime.datetime.utcnow().timestamp()
+                unwritten.extend(
+                    {
+                        "case_id": case_id,
+                        "guild_id": ctx.guild.id,
+                        "user_id": target.id,
+                        "moderator_id": ctx.author.id,
+                        "action": action,
+                        "reason": reason,
+                        "timestamp": timestamp
+                    }
+                    for case_id, target in zip(case_ids, batch)
+                )
+            await db.create_moderation_cases(unwritten)
+            cases.extend(unwritten)
+            unwritten.clear()
+    
+    async def apply(target):
+        await act(target)
+        completed.append(target)
+    
+    last_update = time.monotonic()
+    async def progress(done, failures):
+        nonlocal last_update
+        try:
+            await record_cases()
+        except Exception as e:
+            # Retried with the next batch
+            logger.error(f"Failed to record mass {action} cases in guild {ctx.guild.id}: {e}")
+        if time.monotonic() - last_update >= 3:
+            last_update = time.monotonic()
+            await status.edit(content=f"⏳ {verb.title()} {done}/{len(targets)} ({failures} failed)...", embed=None)
+    
+    await status.edit(content=f"⏳ Working on {len(targets)} members...", embed=None)
+    pool = BoundedWorkerPool()
+    unrecorded = 0
+    try:
+        succeeded, failed = await pool.run(targets, apply, progress)
+    finally:
+        # Actions already taken get their cases even if the run itself was interrupted
+        try:
+            await record_cases(final=True)
+        except Exception as e:
+            unrecorded = len(completed) + len(unwritten)
+            logger.error(f"Failed to record {unrecorded} mass {action} cases in guild {ctx.guild.id}: {e}")
+    
+    cases.sort(key=lambda case: case["case_id"])
+    case_range = f"#{cases[0]['case_id']}–#{cases[-1]['case_id']}" if cases else "None"
+    if unrecorded:
+        case_range += f" ({unrecorded} not recorded)"
+    embed = discord.Embed(
+        title=f"🔨 Mass {action.title()} Complete",
+        description=f"**{verb.title()}:** {len(succeeded)}\n**Failed:** {len(failed)}\n**Skipped:** {skipped}\n**Cases:** {case_range}\n**Reason:** {reason}",
+        color=SUCCESS_COLOR if not failed else WARNING_COLOR
+    )
+    if failed:
+        embed.add_field(
+            name="Failures",
+            value="\n".join(f"`{target.id}`: {error}" for target, error in failed[:10])[:1024],
+            inline=False
+        )
+    try:
+        await status.edit(content=None, embed=embed)
+    except discord.HTTPException:
+        await ctx.send(embed=embed)
+    
+    # One summary log with the full list attached, instead of an embed per member
+    guild_data = await db.get_guild(ctx.guild.id) or {}
+    if "moderation" in guild_data and guild_data["moderation"].get("log_channel"):
+        log_channel = bot.get_channel(guild_data["moderation"]["log_channel"])
+        if log_channel:
+            log_embed = discord.Embed(
+                title=f"Mass {action.title()} | Cases {case_range}",
+                description=f"**Moderator:** {ctx.author.mention}\n**{verb.title()}:** {len(succeeded)}\n**Failed:** {len(failed)}\n**Reason:** {reason}",
+                color=ERROR_COLOR,
+                timestamp=datetime.datetime.utcnow()
+            )
+            lines = [f"{case['case_id']}\t{case['user_id']}\t{action}" for case in cases]
+            lines += [f"-\t{target.id}\tfailed: {error}" for target, error in failed]
+            report = discord.File(BytesIO("\n".join(lines).encode()), filename=f"mass-{action}-{ctx.message.id}.txt")
+            log_dispatcher.dispatch(log_channel, log_embed, report)
+    
+    return len(succeeded)
+
+@bot.command()
+@commands.has_permissions(ban_members=True)
+async def massban(ctx, *, arguments: str):
+    """Ban many users by ID/mention or by join time (joined:<minutes>)"""
+    try:
+        banned = await run_mass_action(ctx, "ban", arguments)
+        db.increment_stats("members_banned", banned)
+    except Exception as e:
+        await ctx.send(f"❌ Error running mass ban: {e}")
+    
+    db.increment_stats("commands_used")
+
+@bot.command()
+@commands.has_permissions(kick_members=True)
+async def masskick(ctx, *, arguments: str):
+    """Kick many members by ID/mention or by join time (joined:<minutes>)"""
+    try:
+        kicked = await run_mass_action(ctx, "kick", arguments)
+        db.increment_stats("members_kicked", kicked)
+    except Exception as e:
+        await ctx.send(f"❌ Error running mass kick: {e}")
+    
+    db.increment_stats("commands_used")
+
+@bot.command()
+@commands.has_permissions(manage_roles=True)
+async def muteresync(ctx):
+    """Reapply the mute role's permissions to every channel"""
+    try:
+        guild_data = await db.get_guild(ctx.guild.id) or {}
+        mute_role = ctx.guild.get_role(guild_data.get("moderation", {}).get("mute_role") or 0)
+        if mute_role is None:
+            await ctx.send("❌ No mute role is configured. Use `!setup` to set one.")
+            return
+        
+        status = await ctx.send(f"⏳ Checking {len(ctx.guild.channels)} channels...")
+        last_update = time.monotonic()
+        async def progress(done, total):
+            nonlocal last_update
+            if time.monotonic() - last_update >= 3:
+                last_update = time.monotonic()
+                await status.edit(content=f"⏳ Applying mute role permissions... {done}/{total}")
+        
+        summary = await apply_role_permissions(
+            ctx.guild, mute_role, MUTE_ROLE_PERMISSIONS,
+            progress=progress, reason=f"Mute role resync by {ctx.author}"
+        )
         embed = discord.Embed(
-            title="✅ User Unbanned",
-            description=f"{ban_entry.user.mention} ({ban_entry.user.id}) has been unbanned from the server.\n**Reason:** {reason}\n**Case ID:** {case_count}",
-            color=SUCCESS_COLOR
+            title="🔇 Mute Role Resynced",
+            description=format_permission_summary(summary),
+            color=SUCCESS_COLOR if not summary["failed"] else WARNING_COLOR
         )
-        await ctx.send(embed=embed)
-        
-        # Log the action
-        if "moderation" in guild_data and guild_data["moderation"].get("log_channel"):
-            log_channel = bot.get_channel(guild_data["moderation"]["log_channel"])
-            if log_channel:
-                log_embed = discord.Embed(
-                    title=f"User Unbanned | Case #{case_count}",
-                    description=f"**User:** {ban_entry.user} ({ban_entry.user.id})\n**Moderator:** {ctx.author.mention}\n**Reason:** {reason}",
-                    color=SUCCESS_COLOR,
-                    timestamp=datetime.datetime.utcnow()
-                )
-                await log_channel.send(embed=log_embed)
-                
+        await status.edit(content=None, embed=embed)
     except Exception as e:
-        await ctx.send(f"❌ Error unbanning user: {e}")
+        await ctx.send(f"❌ Error resyncing mute role: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 @commands.has_permissions(manage_messages=True)
@@ -1258,9 +3410,7 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
     try:
         # Create moderation case
         guild_data = await db.get_guild(ctx.guild.id) or {}
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1281,7 +3431,7 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
                 description=f"**Reason:** {reason}\n**Case ID:** {case_count}",
                 color=WARNING_COLOR
             )
-            await member.send(embed=embed)
+            await outbound.send(member, embed=embed, priority=PRIORITY_DM)
         except:
             pass  # Member might have DMs disabled
         
@@ -1304,13 +3454,13 @@ async def warn(ctx, member: discord.Member, *, reason="No reason provided"):
                     timestamp=datetime.datetime.utcnow()
                 )
                 log_embed.set_thumbnail(url=member.display_avatar.url)
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
     except Exception as e:
         await ctx.send(f"❌ Error warning member: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("members_warned")
+    db.increment_stats("commands_used")
+    db.increment_stats("members_warned")
 
 @bot.command()
 @commands.has_permissions(manage_roles=True)
@@ -1360,9 +3510,7 @@ async def mute(ctx, member: discord.Member, duration: str = None, *, reason="No
         guild_data = await db.get_guild(ctx.guild.id) or {}
         
         # Create moderation case
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1398,7 +3546,7 @@ async def mute(ctx, member: discord.Member, duration: str = None, *, reason="No
                 description=f"**Duration:** {duration_text}\n**Reason:** {reason}\n**Case ID:** {case_count}",
                 color=WARNING_COLOR
             )
-            await member.send(embed=embed)
+            await outbound.send(member, embed=embed, priority=PRIORITY_DM)
         except:
             pass  # Member might have DMs disabled
         
@@ -1421,13 +3569,13 @@ async def mute(ctx, member: discord.Member, duration: str = None, *, reason="No
                     timestamp=datetime.datetime.utcnow()
                 )
                 log_embed.set_thumbnail(url=member.display_avatar.url)
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
     except Exception as e:
         await ctx.send(f"❌ Error muting member: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("members_muted")
+    db.increment_stats("commands_used")
+    db.increment_stats("members_muted")
 
 @bot.command()
 @commands.has_permissions(manage_roles=True)
@@ -1441,9 +3589,7 @@ async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
         
         # Create moderation case
         guild_data = await db.get_guild(ctx.guild.id) or {}
-        case_count = guild_data.get("case_count", 0) + 1
-        guild_data["case_count"] = case_count
-        await db.update_guild(ctx.guild.id, guild_data)
+        case_count = await db.allocate_case_id(ctx.guild.id)
         
         case_data = {
             "case_id": case_count,
@@ -1467,7 +3613,7 @@ async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
                 description=f"**Reason:** {reason}\n**Case ID:** {case_count}",
                 color=SUCCESS_COLOR
             )
-            await member.send(embed=embed)
+            await outbound.send(member, embed=embed, priority=PRIORITY_DM)
         except:
             pass  # Member might have DMs disabled
         
@@ -1490,42 +3636,269 @@ async def unmute(ctx, member: discord.Member, *, reason="No reason provided"):
                     timestamp=datetime.datetime.utcnow()
                 )
                 log_embed.set_thumbnail(url=member.display_avatar.url)
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
     except Exception as e:
         await ctx.send(f"❌ Error unmuting member: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
+
+# Purge Regex Matching
+class RegexMatcher:
+    """Runs purge regex searches in one worker process, killing and replacing it when a search overruns"""
+    def __init__(self):
+        self.pool = None
+        self.lock = asyncio.Lock()
+        self.killed = 0
+    
+    def start(self):
+        if self.pool is None:
+            self.pool = multiprocessing.get_context(RANK_CARD_START_METHOD).Pool(1)
+    
+    async def search(self, pattern, content: str, timeout: float) -> bool:
+        # One search in flight at a time, so a kill only ever takes out the search that overran
+        async with self.lock:
+            self.start()
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            def settle(setter, value):
+                loop.call_soon_threadsafe(lambda: future.done() or setter(value))
+            self.pool.apply_async(
+                search_pattern, (pattern.pattern, pattern.flags, content),
+                callback=lambda result: settle(future.set_result, result),
+                error_callback=lambda error: settle(future.set_exception, error)
+            )
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Still running a search nobody is waiting for
+                self.killed += 1
+                self.close()
+                raise
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+regex_matcher = RegexMatcher()
+
+class PurgeJob:
+    """Walks channel history lazily, bulk-deleting recent matches and queueing older ones for single deletes"""
+    def __init__(self, channel, amount: int, check, before=None):
+        self.channel = channel
+        self.amount = amount
+        self.check = check
+        self.before = before
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+    
+    async def run(self, progress=None):
+        cutoff = discord.utils.utcnow() - PURGE_BULK_MAX_AGE
+        chunk = []
+        # Bounded so a slow single-delete queue pauses history paging instead of buffering it
+        old_messages = asyncio.Queue(maxsize=PURGE_QUEUE_SIZE)
+        worker = asyncio.create_task(self.delete_old(old_messages))
+        
+        try:
+            async for message in self.channel.history(limit=PURGE_SCAN_LIMIT, before=self.before):
+                self.scanned += 1
+                if await self.check(message):
+                    self.matched += 1
+                    if message.created_at > cutoff:
+                        chunk.append(message)
+                        if len(chunk) == 100:
+                            await self.bulk_delete(chunk)
+                            chunk = []
+                    else:
+                        await old_messages.put(message)
+                
+                if progress is not None:
+                    await progress(self)
+                if self.matched >= self.amount:
+                    break
+            
+            if chunk:
+                await self.bulk_delete(chunk)
+            await old_messages.put(None)
+            await worker
+        finally:
+            worker.cancel()
+        return self
+    
+    async def bulk_delete(self, messages):
+        try:
+            if len(messages) == 1:
+                await messages[0].delete()
+            else:
+                await self.channel.delete_messages(messages)
+            self.deleted += len(messages)
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            self.failed += len(messages)
+            logger.error(f"Bulk delete in channel {self.channel.id} failed: {e}")
+    
+    async def delete_old(self, queue):
+        while True:
+            message = await queue.get()
+            if message is None:
+                return
+            try:
+                await message.delete()
+                self.deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                self.failed += 1
+            await asyncio.sleep(PURGE_SINGLE_DELETE_DELAY)
+
+def unsafe_regex_reason(parsed, repeated: bool = False) -> Optional[str]:
+    # Flags constructs that backtrack catastrophically: a variable-width quantifier inside
+    # a repeat (including bounded ones like (?:a?){25}), alternation inside a repeat and
+    # backreferences. Not exhaustive, RegexMatcher's timeout is what actually bounds a search
+    for op, av in parsed:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, subpattern = av
+            repeats = high > 1
+            if repeated and low != high:
+                return "nested quantifiers"
+            reason = unsafe_regex_reason(subpattern, repeated or repeats)
+        elif op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return "backreferences"
+        elif op == sre_parse.BRANCH and repeated:
+            return "alternation inside a repeated group"
+        else:
+            reason = None
+            stack = [av]
+            while stack and reason is None:
+                value = stack.pop()
+                if isinstance(value, sre_parse.SubPattern):
+                    reason = unsafe_regex_reason(value, repeated)
+                elif isinstance(value, (tuple, list)):
+                    stack.extend(value)
+        if reason:
+            return reason
+    return None
+
+def compile_purge_regex(source: str):
+    if not source:
+        raise commands.BadArgument("`regex:` needs a pattern.")
+    if len(source) > PURGE_REGEX_MAX_LENGTH:
+        raise commands.BadArgument(f"`regex:` patterns are limited to {PURGE_REGEX_MAX_LENGTH} characters.")
+    try:
+        reason = unsafe_regex_reason(sre_parse.parse(source, re.IGNORECASE))
+        pattern = re.compile(source, re.IGNORECASE)
+    except re.error as e:
+        raise commands.BadArgument(f"Invalid `regex:` pattern: {e}")
+    if reason:
+        raise commands.BadArgument(f"`regex:` patterns cannot use {reason}, they can stall the bot.")
+    return pattern
+
+def build_purge_check(ctx, filters: str) -> tuple:
+    # Parses "[@user|ID ...] [bots] [attachments] [regex:<pattern>]" into (check, description)
+    user_ids = set()
+    bots_only = False
+    attachments_only = False
+    pattern = None
+    
+    if filters:
+        regex_at = filters.find("regex:")
+        if regex_at != -1:
+            pattern = compile_purge_regex(filters[regex_at + 6:].strip())
+            filters = filters[:regex_at]
+        for word in filters.split():
+            match = re.fullmatch(r"<@!?(\d+)>|(\d{15,20})", word)
+            if match:
+                user_ids.add(int(match.group(1) or match.group(2)))
+            elif word.lower() in ("bots", "bot"):
+                bots_only = True
+            elif word.lower() in ("attachments", "files", "images"):
+                attachments_only = True
+            else:
+                raise commands.BadArgument(f"Unknown purge filter `{word}`. Use mentions/IDs, `bots`, `attachments` or `regex:<pattern>`.")
+    
+    # Searches run in the matcher process and the whole scan shares one time budget
+    regex_time = 0.0
+    async def matches(content: str) -> bool:
+        nonlocal regex_time
+        start = time.perf_counter()
+        try:
+            return await regex_matcher.search(pattern, content, PURGE_REGEX_BUDGET - regex_time)
+        except asyncio.TimeoutError:
+            raise commands.BadArgument(f"The `regex:` filter took over {PURGE_REGEX_BUDGET:g}s to match, use a simpler pattern.")
+        finally:
+            regex_time += time.perf_counter() - start
+    
+    async def check(message):
+        if user_ids and message.author.id not in user_ids:
+            return False
+        if bots_only and not message.author.bot:
+            return False
+        if attachments_only and not message.attachments:
+            return False
+        if pattern is not None and not await matches(message.content):
+            return False
+        return True
+    
+    description = []
+    if user_ids:
+        description.append("Users: " + ", ".join(f"<@{user_id}>" for user_id in user_ids))
+    if bots_only:
+        description.append("Bots only")
+    if attachments_only:
+        description.append("With attachments")
+    if pattern is not None:
+        description.append(f"Matching `{pattern.pattern}`")
+    return check, ", ".join(description) or "None"
 
 @bot.command()
 @commands.has_permissions(manage_messages=True)
-async def purge(ctx, amount: int, user: discord.Member = None):
-    """Delete a specified number of messages"""
-    if amount <= 0 or amount > 100:
-        await ctx.send("❌ Please provide a number between 1 and 100.")
+async def purge(ctx, amount: int, *, filters: str = None):
+    """Delete messages, optionally filtered by users, bots, attachments or regex:<pattern>"""
+    if amount <= 0 or amount > PURGE_MAX_AMOUNT:
+        await ctx.send(f"❌ Please provide a number between 1 and {PURGE_MAX_AMOUNT}.")
+        return
+    
+    try:
+        check, filter_description = build_purge_check(ctx, filters)
+    except commands.BadArgument as e:
+        await ctx.send(f"❌ Invalid filter: {e}")
         return
     
     try:
         await ctx.message.delete()  # Delete the command message
         
-        if user:
-            def check(msg):
-                return msg.author == user
-                
-            deleted = await ctx.channel.purge(limit=amount, check=check)
-            embed = discord.Embed(
-                title="✅ Messages Purged",
-                description=f"Deleted {len(deleted)} messages from {user.mention}.",
-                color=SUCCESS_COLOR
-            )
-        else:
-            deleted = await ctx.channel.purge(limit=amount)
-            embed = discord.Embed(
-                title="✅ Messages Purged",
-                description=f"Deleted {len(deleted)} messages.",
-                color=SUCCESS_COLOR
-            )
+        status = None
+        last_update = time.monotonic()
+        async def progress(job):
+            nonlocal status, last_update
+            if time.monotonic() - last_update < PURGE_PROGRESS_INTERVAL:
+                return
+            last_update = time.monotonic()
+            text = f"⏳ Purging... {job.deleted}/{job.amount} deleted, {job.scanned} messages scanned"
+            if status is None:
+                status = await ctx.send(text)
+            else:
+                await status.edit(content=text)
         
+        job = await PurgeJob(ctx.channel, amount, check, before=ctx.message).run(progress)
+        
+        description = f"Deleted {job.deleted} messages."
+        if job.failed:
+            description += f"\n{job.failed} messages could not be deleted."
+        if job.matched < amount and job.scanned >= PURGE_SCAN_LIMIT:
+            description += f"\nStopped after scanning {PURGE_SCAN_LIMIT} messages."
+        embed = discord.Embed(
+            title="✅ Messages Purged",
+            description=description,
+            color=SUCCESS_COLOR
+        )
+        
+        if status is not None:
+            await status.delete()
         confirm_msg = await ctx.send(embed=embed)
         await asyncio.sleep(5)  # Show confirmation for 5 seconds
         await confirm_msg.delete()
@@ -1537,16 +3910,108 @@ async def purge(ctx, amount: int, user: discord.Member = None):
             if log_channel:
                 log_embed = discord.Embed(
                     title="Messages Purged",
-                    description=f"**Moderator:** {ctx.author.mention}\n**Channel:** {ctx.channel.mention}\n**Messages Deleted:** {len(deleted)}\n**Target User:** {user.mention if user else 'None'}",
+                    description=f"**Moderator:** {ctx.author.mention}\n**Channel:** {ctx.channel.mention}\n**Messages Deleted:** {job.deleted}\n**Messages Scanned:** {job.scanned}\n**Filters:** {filter_description}",
                     color=WARNING_COLOR,
                     timestamp=datetime.datetime.utcnow()
                 )
-                await log_channel.send(embed=log_embed)
+                log_dispatcher.dispatch(log_channel, log_embed)
                 
+    except commands.BadArgument as e:
+        await ctx.send(f"❌ Purge stopped: {e}")
     except Exception as e:
         await ctx.send(f"❌ Error purging messages: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
+
+def build_infractions_embed(member, cases, total, page):
+    embed = discord.Embed(
+        title=f"Infractions for {member}",
+        description=f"Found {total} infractions for this user.",
+        color=EMBED_COLOR
+    )
+    
+    for case in cases:
+        action = case.get("action", "unknown").upper()
+        reason = case.get("reason", "No reason provided")
+        case_id = case.get("case_id", 0)
+        timestamp = datetime.datetime.fromtimestamp(case.get("timestamp", 0))
+        
+        # Format action for display
+        if action == "BAN":
+            action = "🔨 BAN"
+        elif action == "KICK":
+            action = "👢 KICK"
+        elif action == "WARN":
+            action = "⚠️ WARN"
+        elif action == "MUTE":
+            action = "🔇 MUTE"
+        elif action == "UNMUTE":
+            action = "🔊 UNMUTE"
+        elif action == "UNBAN":
+            action = "✅ UNBAN"
+        
+        embed.add_field(
+            name=f"Case #{case_id} | {action} | {timestamp.strftime('%Y-%m-%d')}",
+            value=f"**Reason:** {reason}",
+            inline=False
+        )
+    
+    pages = (total + INFRACTIONS_PAGE_SIZE - 1) // INFRACTIONS_PAGE_SIZE
+    embed.set_footer(text=f"Page {page + 1}/{max(pages, 1)} • Newest first")
+    return embed
+
+class InfractionsView(discord.ui.View):
+    """Keyset-paginated browser over a user's moderation cases"""
+    def __init__(self, author, member, guild_id, total, first_page):
+        super().__init__(timeout=120)
+        self.author = author
+        self.member = member
+        self.guild_id = guild_id
+        self.total = total
+        self.page = 0
+        self.cases = first_page
+        # cursors[i] is the keyset cursor that fetches page i
+        self.cursors = [None]
+        self.update_buttons()
+    
+    def update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        # A short page means cases were deleted since the count, so there is nothing after it
+        self.next_page.disabled = (
+            len(self.cases) < INFRACTIONS_PAGE_SIZE
+            or (self.page + 1) * INFRACTIONS_PAGE_SIZE >= self.total
+        )
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author.id
+    
+    async def show_page(self, interaction: discord.Interaction):
+        # The count is refreshed with each page so the footer and buttons follow deletions
+        self.cases, self.total = await asyncio.gather(
+            db.get_user_cases(self.member.id, self.guild_id, INFRACTIONS_PAGE_SIZE, self.cursors[self.page]),
+            db.count_user_cases(self.member.id, self.guild_id)
+        )
+        self.update_buttons()
+        embed = build_infractions_embed(self.member, self.cases, self.total, self.page)
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.show_page(interaction)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not self.cases:
+            button.disabled = True
+            await interaction.response.edit_message(view=self)
+            return
+        
+        last = self.cases[-1]
+        if len(self.cursors) == self.page + 1:
+            self.cursors.append((last.get("timestamp", 0), last.get("case_id", 0)))
+        self.page += 1
+        await self.show_page(interaction)
 
 @bot.command()
 @commands.has_permissions(manage_messages=True)
@@ -1556,8 +4021,8 @@ async def infractions(ctx, member: discord.Member = None):
         member = ctx.author
     
     try:
-        # Get user cases
-        cases = await db.get_user_cases(member.id, ctx.guild.id)
+        # Only the first page is fetched; the buttons page through the rest
+        cases = await db.get_user_cases(member.id, ctx.guild.id, INFRACTIONS_PAGE_SIZE)
         
         if not cases:
             embed = discord.Embed(
@@ -1568,52 +4033,118 @@ async def infractions(ctx, member: discord.Member = None):
             await ctx.send(embed=embed)
             return
         
-        # Sort cases by timestamp (newest first)
-        cases.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
+        total = await db.count_user_cases(member.id, ctx.guild.id)
+        embed = build_infractions_embed(member, cases, total, 0)
+        
+        if total > INFRACTIONS_PAGE_SIZE:
+            await ctx.send(embed=embed, view=InfractionsView(ctx.author, member, ctx.guild.id, total, cases))
+        else:
+            await ctx.send(embed=embed)
+        
+    except Exception as e:
+        await ctx.send(f"❌ Error retrieving infractions: {e}")
+    
+    db.increment_stats("commands_used")
+
+# Leveling Commands
+@bot.command()
+async def rank(ctx, member: discord.Member = None):
+    """Check your rank or someone else's"""
+    if member is None:
+        member = ctx.author
+    
+    try:
+        level_data = await db.get_level(member.id, ctx.guild.id)
+        if not level_data:
+            await ctx.send(f"❌ {member.display_name} hasn't earned any XP yet.")
+            return
+        
+        leaderboard = await db.get_leaderboard(ctx.guild.id)
+        position = leaderboard.rank(member.id)
+        
+        xp = level_data.get("xp", 0)
+        level = level_data.get("level", 0)
+        next_level_xp = 100 * (level + 1) ** 2
         
-        # Create embed
         embed = discord.Embed(
-            title=f"Infractions for {member}",
-            description=f"Found {len(cases)} infractions for this user.",
+            title=f"{member.display_name}'s Rank",
             color=EMBED_COLOR
         )
+        embed.add_field(name="Rank", value=f"#{position:,} of {len(leaderboard):,}" if position else "Unranked", inline=True)
+        embed.add_field(name="Level", value=str(level), inline=True)
+        embed.add_field(name="XP", value=f"{xp:,} / {next_level_xp:,}", inline=True)
         
-        # Add up to 10 most recent cases
-        for case in cases[:10]:
-            action = case.get("action", "unknown").upper()
-            reason = case.get("reason", "No reason provided")
-            case_id = case.get("case_id", 0)
-            timestamp = datetime.datetime.fromtimestamp(case.get("timestamp", 0))
-            
-            # Format action for display
-            if action == "BAN":
-                action = "🔨 BAN"
-            elif action == "KICK":
-                action = "👢 KICK"
-            elif action == "WARN":
-                action = "⚠️ WARN"
-            elif action == "MUTE":
-                action = "🔇 MUTE"
-            elif action == "UNMUTE":
-                action = "🔊 UNMUTE"
-            elif action == "UNBAN":
-                action = "✅ UNBAN"
-            
-            embed.add_field(
-                name=f"Case #{case_id} | {action} | {timestamp.strftime('%Y-%m-%d')}",
-                value=f"**Reason:** {reason}",
-                inline=False
-            )
+        # The card renders in a worker process; fall back to the thumbnail if it fails
+        try:
+            card = await rank_cards.render(member, level_data)
+        except Exception as e:
+            logger.error(f"Failed to render rank card for {member.id}: {e}")
+            embed.set_thumbnail(url=member.display_avatar.url)
+            await ctx.send(embed=embed)
+        else:
+            embed.set_image(url="attachment://rank.png")
+            await ctx.send(embed=embed, file=discord.File(card, filename="rank.png"))
+        
+    except Exception as e:
+        await ctx.send(f"❌ Error checking rank: {e}")
+    
+    db.increment_stats("commands_used")
+
+@bot.command()
+@commands.is_owner()
+async def cardbench(ctx, count: int = 200):
+    """Benchmark rank card rendering throughput"""
+    try:
+        count = min(max(count, 1), 5000)
+        result = await rank_cards.benchmark(count)
+        embed = discord.Embed(
+            title="🖼️ Rank Card Benchmark",
+            description=(
+                f"Rendered **{result['cards']:,}** cards in {result['seconds']:.2f}s "
+                f"on {result['workers']} workers\n**{result['cards_per_second']:.1f} cards/s**"
+            ),
+            color=EMBED_COLOR
+        )
+        embed.add_field(name="Cached Cards", value=str(rank_cards.cache.stats()["size"]), inline=True)
+        embed.add_field(name="Cache Hit Rate", value=f"{rank_cards.cache.stats()['hit_rate']:.0%}", inline=True)
+        await ctx.send(embed=embed)
+    except Exception as e:
+        await ctx.send(f"❌ Error running benchmark: {e}")
+    
+    db.increment_stats("commands_used")
+
+@bot.command(aliases=["lb", "top"])
+async def leaderboard(ctx, page: int = 1):
+    """Show the server's XP leaderboard"""
+    try:
+        leaderboard = await db.get_leaderboard(ctx.guild.id)
+        if not len(leaderboard):
+            await ctx.send("❌ Nobody has earned any XP on this server yet.")
+            return
+        
+        pages = (len(leaderboard) + 9) // 10
+        page = max(1, min(page, pages))
         
-        if len(cases) > 10:
-            embed.set_footer(text=f"Showing 10 most recent out of {len(cases)} infractions.")
+        lines = []
+        for position, user_id, xp in leaderboard.page((page - 1) * 10, 10):
+            member = ctx.guild.get_member(user_id)
+            name = member.display_name if member else f"User {user_id}"
+            level = int(0.1 * (xp ** 0.5))
+            lines.append(f"**#{position}** {name} - Level {level} ({xp:,} XP)")
+        
+        embed = discord.Embed(
+            title=f"{ctx.guild.name} Leaderboard",
+            description="\n".join(lines),
+            color=EMBED_COLOR
+        )
+        embed.set_footer(text=f"Page {page}/{pages} • Use !leaderboard <page> to see more")
         
         await ctx.send(embed=embed)
         
     except Exception as e:
-        await ctx.send(f"❌ Error retrieving infractions: {e}")
+        await ctx.send(f"❌ Error displaying leaderboard: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 # Economy Commands
 @bot.command()
@@ -1632,21 +4163,9 @@ async def balance(ctx, member: discord.Member = None):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get user economy data
-        economy_data = await db.get_economy(member.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": member.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
-            await db.update_economy(member.id, economy_data)
+        # Get user economy data, creating it if it doesn't exist
+        starting_balance = guild_data["economy"]["starting_balance"]
+        economy_data = await db.get_or_create_economy(member.id, starting_balance)
         
         # Create embed
         embed = discord.Embed(
@@ -1680,7 +4199,7 @@ async def balance(ctx, member: discord.Member = None):
     except Exception as e:
         await ctx.send(f"❌ Error checking balance: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def daily(ctx):
@@ -1695,28 +4214,17 @@ async def daily(ctx):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get user economy data
-        economy_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
+        # Determine daily amount
+        is_premium = await db.is_premium(ctx.guild.id)
+        daily_amount = 300 if is_premium else 200
         
-        # Check cooldown
-        last_daily = economy_data.get("last_daily", 0)
-        now = time.time()
+        # Claim the reward; the 24 hour cooldown (86400 seconds) is checked atomically
+        starting_balance = guild_data["economy"]["starting_balance"]
+        claimed, economy_data = await db.claim_economy_reward(ctx.author.id, "last_daily", 86400, daily_amount, starting_balance)
         
-        # 24 hours = 86400 seconds
-        if now - last_daily < 86400:
-            next_daily = last_daily + 86400
+        if not claimed:
+            now = time.time()
+            next_daily = economy_data.get("last_daily", 0) + 86400
             time_left = next_daily - now
             hours = int(time_left // 3600)
             minutes = int((time_left % 3600) // 60)
@@ -1729,16 +4237,6 @@ async def daily(ctx):
             await ctx.send(embed=embed)
             return
         
-        # Determine daily amount
-        is_premium = await db.is_premium(ctx.guild.id)
-        daily_amount = 300 if is_premium else 200
-        
-        # Update user data
-        economy_data["balance"] = economy_data.get("balance", 0) + daily_amount
-        economy_data["last_daily"] = now
-        
-        await db.update_economy(ctx.author.id, economy_data)
-        
         # Create embed
         embed = discord.Embed(
             title="✅ Daily Reward Claimed",
@@ -1760,8 +4258,8 @@ async def daily(ctx):
     except Exception as e:
         await ctx.send(f"❌ Error claiming daily reward: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("daily_rewards_claimed")
+    db.increment_stats("commands_used")
+    db.increment_stats("daily_rewards_claimed")
 
 @bot.command()
 async def work(ctx):
@@ -1776,40 +4274,6 @@ async def work(ctx):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get user economy data
-        economy_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
-        
-        # Check cooldown
-        last_work = economy_data.get("last_work", 0)
-        now = time.time()
-        
-        # 30 minutes = 1800 seconds
-        if now - last_work < 1800:
-            next_work = last_work + 1800
-            time_left = next_work - now
-            minutes = int(time_left // 60)
-            seconds = int(time_left % 60)
-            
-            embed = discord.Embed(
-                title="⏰ Work on Cooldown",
-                description=f"You need to wait **{minutes}m {seconds}s** before working again.",
-                color=WARNING_COLOR
-            )
-            await ctx.send(embed=embed)
-            return
-        
         # Work jobs and messages
         jobs = [
             {"job": "Software Developer", "min": 50, "max": 200},
@@ -1846,11 +4310,24 @@ async def work(ctx):
         
         amount = random.randint(min_amount, max_amount)
         
-        # Update user data
-        economy_data["balance"] = economy_data.get("balance", 0) + amount
-        economy_data["last_work"] = now
+        # Pay out; the 30 minute cooldown (1800 seconds) is checked atomically
+        starting_balance = guild_data["economy"]["starting_balance"]
+        claimed, economy_data = await db.claim_economy_reward(ctx.author.id, "last_work", 1800, amount, starting_balance)
         
-        await db.update_economy(ctx.author.id, economy_data)
+        if not claimed:
+            now = time.time()
+            next_work = economy_data.get("last_work", 0) + 1800
+            time_left = next_work - now
+            minutes = int(time_left // 60)
+            seconds = int(time_left % 60)
+            
+            embed = discord.Embed(
+                title="⏰ Work on Cooldown",
+                description=f"You need to wait **{minutes}m {seconds}s** before working again.",
+                color=WARNING_COLOR
+            )
+            await ctx.send(embed=embed)
+            return
         
         # Create message
         message = random.choice(messages).format(
@@ -1880,8 +4357,8 @@ async def work(ctx):
     except Exception as e:
         await ctx.send(f"❌ Error working: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("work_completed")
+    db.increment_stats("commands_used")
+    db.increment_stats("work_completed")
 
 @bot.command()
 async def deposit(ctx, amount: str):
@@ -1896,49 +4373,31 @@ async def deposit(ctx, amount: str):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get user economy data
-        economy_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
-        
-        current_balance = economy_data.get("balance", 0)
-        
         # Handle special amount values
-        if amount.lower() == "all":
-            deposit_amount = current_balance
-        elif amount.lower() == "half":
-            deposit_amount = current_balance // 2
+        if amount.lower() in ("all", "half"):
+            deposit_amount = amount.lower()
         else:
             try:
                 deposit_amount = int(amount)
             except:
                 await ctx.send("❌ Please provide a valid amount.")
                 return
+            
+            if deposit_amount <= 0:
+                await ctx.send("❌ You must deposit a positive amount.")
+                return
         
-        if deposit_amount <= 0:
-            await ctx.send("❌ You must deposit a positive amount.")
-            return
+        # Move the money in a single guarded update
+        starting_balance = guild_data["economy"]["starting_balance"]
+        deposit_amount, economy_data = await db.move_economy_funds(ctx.author.id, "balance", "bank", deposit_amount, starting_balance)
         
-        if deposit_amount > current_balance:
-            await ctx.send("❌ You don't have that much money in your wallet.")
+        if deposit_amount <= 0:
+            if amount.lower() in ("all", "half"):
+                await ctx.send("❌ You must deposit a positive amount.")
+            else:
+                await ctx.send("❌ You don't have that much money in your wallet.")
             return
         
-        # Update balances
-        economy_data["balance"] = current_balance - deposit_amount
-        economy_data["bank"] = economy_data.get("bank", 0) + deposit_amount
-        
-        await db.update_economy(ctx.author.id, economy_data)
-        
         # Create embed
         embed = discord.Embed(
             title="💳 Money Deposited",
@@ -1963,7 +4422,7 @@ async def deposit(ctx, amount: str):
     except Exception as e:
         await ctx.send(f"❌ Error depositing money: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def withdraw(ctx, amount: str):
@@ -1978,49 +4437,31 @@ async def withdraw(ctx, amount: str):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get user economy data
-        economy_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
-        
-        current_bank = economy_data.get("bank", 0)
-        
         # Handle special amount values
-        if amount.lower() == "all":
-            withdraw_amount = current_bank
-        elif amount.lower() == "half":
-            withdraw_amount = current_bank // 2
+        if amount.lower() in ("all", "half"):
+            withdraw_amount = amount.lower()
         else:
             try:
                 withdraw_amount = int(amount)
             except:
                 await ctx.send("❌ Please provide a valid amount.")
                 return
+            
+            if withdraw_amount <= 0:
+                await ctx.send("❌ You must withdraw a positive amount.")
+                return
         
-        if withdraw_amount <= 0:
-            await ctx.send("❌ You must withdraw a positive amount.")
-            return
+        # Move the money in a single guarded update
+        starting_balance = guild_data["economy"]["starting_balance"]
+        withdraw_amount, economy_data = await db.move_economy_funds(ctx.author.id, "bank", "balance", withdraw_amount, starting_balance)
         
-        if withdraw_amount > current_bank:
-            await ctx.send("❌ You don't have that much money in your bank.")
+        if withdraw_amount <= 0:
+            if amount.lower() in ("all", "half"):
+                await ctx.send("❌ You must withdraw a positive amount.")
+            else:
+                await ctx.send("❌ You don't have that much money in your bank.")
             return
         
-        # Update balances
-        economy_data["bank"] = current_bank - withdraw_amount
-        economy_data["balance"] = economy_data.get("balance", 0) + withdraw_amount
-        
-        await db.update_economy(ctx.author.id, economy_data)
-        
         # Create embed
         embed = discord.Embed(
             title="💸 Money Withdrawn",
@@ -2045,7 +4486,7 @@ async def withdraw(ctx, amount: str):
     except Exception as e:
         await ctx.send(f"❌ Error withdrawing money: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def pay(ctx, member: discord.Member, amount: int):
@@ -2068,48 +4509,14 @@ async def pay(ctx, member: discord.Member, amount: int):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Get sender's economy data
-        sender_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the sender, create it
-        if not sender_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            sender_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
+        # Transfer money; the sender's balance is checked as part of the debit
+        starting_balance = guild_data["economy"]["starting_balance"]
+        sender_data, recipient_data = await db.transfer_balance(ctx.author.id, member.id, amount, starting_balance)
         
-        # Check if sender has enough money
-        if sender_data.get("balance", 0) < amount:
+        if sender_data is None:
             await ctx.send("❌ You don't have enough money in your wallet.")
             return
         
-        # Get recipient's economy data
-        recipient_data = await db.get_economy(member.id) or {}
-        
-        # If no economy data exists for the recipient, create it
-        if not recipient_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            recipient_data = {
-                "_id": member.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
-        
-        # Transfer money
-        sender_data["balance"] = sender_data.get("balance", 0) - amount
-        recipient_data["balance"] = recipient_data.get("balance", 0) + amount
-        
-        await db.update_economy(ctx.author.id, sender_data)
-        await db.update_economy(member.id, recipient_data)
-        
         # Create embed
         embed = discord.Embed(
             title="💸 Money Transferred",
@@ -2139,18 +4546,48 @@ async def pay(ctx, member: discord.Member, amount: int):
                 inline=False
             )
             
-            await member.send(embed=recipient_embed)
+            await outbound.send(member, embed=recipient_embed, priority=PRIORITY_DM)
         except:
             pass  # Recipient might have DMs disabled
         
     except Exception as e:
         await ctx.send(f"❌ Error transferring money: {e}")
     
-    await db.increment_stats("commands_used")
-    await db.increment_stats("money_transferred")
+    db.increment_stats("commands_used")
+    db.increment_stats("money_transferred")
+
+def build_shop_embed(guild_name: str, catalog: ShopCatalog, page: int, currency_symbol: str, is_premium: bool):
+    embed = discord.Embed(
+        title=f"{guild_name}'s Shop",
+        description=f"Use `!buy <item_id>` to purchase an item.",
+        color=EMBED_COLOR
+    )
+    
+    # Premium items are already filtered out of non-premium pages
+    for item in catalog.page(page, is_premium):
+        embed.add_field(
+            name=f"{item['name']} - {currency_symbol} {item['price']:,}",
+            value=f"**ID:** `{item['id']}`\n**Description:** {item['description']}" + 
+                  (f"\n⭐ **Premium Item**" if item.get("premium", False) else ""),
+            inline=False
+        )
+    
+    if not embed.fields:
+        embed.description = "No items available in the shop."
+    
+    footer = []
+    pages = catalog.page_count(is_premium)
+    if pages > 1:
+        footer.append(f"Page {page}/{pages} • Use !shop <page> to see more")
+    # Add premium note if not premium
+    if not is_premium:
+        footer.append("Upgrade to premium to unlock more shop items!")
+    if footer:
+        embed.set_footer(text=" • ".join(footer))
+    return embed
 
 @bot.command()
-async def shop(ctx):
+async def shop(ctx, page: int = 1):
     """View the server shop"""
     try:
         # Get guild settings
@@ -2162,52 +4599,19 @@ async def shop(ctx):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Default shop items if none defined
-        default_shop = [
-            {"id": "role_color", "name": "Custom Role Color", "description": "Change your role color", "price": 500, "premium": False},
-            {"id": "rename", "name": "Nickname Change", "description": "Change your nickname", "price": 200, "premium": False},
-            {"id": "vip_role", "name": "VIP Role", "description": "Get a special VIP role", "price": 2000, "premium": False},
-            {"id": "lootbox", "name": "Lootbox", "description": "Get random rewards", "price": 300, "premium": False},
-            {"id": "xp_boost", "name": "XP Boost (1 hour)", "description": "Get 2x XP for 1 hour", "price": 1000, "premium": True},
-            {"id": "money_boost", "name": "Money Boost (1 hour)", "description": "Get 2x money from work for 1 hour", "price": 1500, "premium": True}
-        ]
-        
-        # Get shop items from guild settings or use default
-        shop_items = guild_data.get("shop_items", default_shop)
         is_premium = await db.is_premium(ctx.guild.id)
+        catalog = get_shop_catalog(ctx.guild.id, guild_data)
+        page = min(max(page, 1), catalog.page_count(is_premium))
         
-        # Create embed
-        embed = discord.Embed(
-            title=f"{ctx.guild.name}'s Shop",
-            description=f"Use `!buy <item_id>` to purchase an item.",
-            color=EMBED_COLOR
-        )
-        
-        # List shop items
-        for item in shop_items:
-            if item.get("premium", False) and not is_premium:
-                continue  # Skip premium items on non-premium servers
-            
-            embed.add_field(
-                name=f"{item['name']} - {currency_symbol} {item['price']:,}",
-                value=f"**ID:** `{item['id']}`\n**Description:** {item['description']}" + 
-                      (f"\n⭐ **Premium Item**" if item.get("premium", False) else ""),
-                inline=False
-            )
-        
-        if not embed.fields:
-            embed.description = "No items available in the shop."
-        
-        # Add premium note if not premium
-        if not is_premium:
-            embed.set_footer(text="Upgrade to premium to unlock more shop items!")
-        
+        # Rebuilt only when the items, currency, guild name or premium status change
+        key = ("shop", ctx.guild.id, is_premium, catalog.version, ctx.guild.name, currency_symbol, page)
+        embed = render_cache.get_or_build(key, lambda: build_shop_embed(ctx.guild.name, catalog, page, currency_symbol, is_premium))
         await ctx.send(embed=embed)
         
     except Exception as e:
         await ctx.send(f"❌ Error displaying shop: {e}")
     
-    await db.increment_stats("commands_used")
+    db.increment_stats("commands_used")
 
 @bot.command()
 async def buy(ctx, item_id: str):
@@ -2222,27 +4626,10 @@ async def buy(ctx, item_id: str):
         currency_name = guild_data["economy"]["currency_name"]
         currency_symbol = guild_data["economy"]["currency_symbol"]
         
-        # Default shop items if none defined
-        default_shop = [
-            {"id": "role_color", "name": "Custom Role Color", "description": "Change your role color", "price": 500, "premium": False},
-            {"id": "rename", "name": "Nickname Change", "description": "Change your nickname", "price": 200, "premium": False},
-            {"id": "vip_role", "name": "VIP Role", "description": "Get a special VIP role", "price": 2000, "premium": False},
-            {"id": "lootbox", "name": "Lootbox", "description": "Get random rewards", "price": 300, "premium": False},
-            {"id": "xp_boost", "name": "XP Boost (1 hour)", "description": "Get 2x XP for 1 hour", "price": 1000, "premium": True},
-            {"id": "money_boost", "name": "Money Boost (1 hour)", "description": "Get 2x money from work for 1 hour", "price": 1500, "premium": True}
-        ]
-        
         # Get shop items from guild settings or use default
-        shop_items = guild_data.get("shop_items", default_shop)
+        item = get_shop_catalog(ctx.guild.id, guild_data).get(item_id)
         is_premium = await db.is_premium(ctx.guild.id)
         
-        # Find the item
-        item = None
-        for shop_item in shop_items:
-            if shop_item["id"] == item_id:
-                item = shop_item
-                break
-        
         if not item:
             await ctx.send("❌ Item not found in shop. Use `!shop` to see available items.")
             return
@@ -2252,20 +4639,9 @@ async def buy(ctx, item_id: str):
             await ctx.send("⭐ This is a premium item and is only available on premium servers.")
             return
         
-        # Get user economy data
-        economy_data = await db.get_economy(ctx.author.id) or {}
-        
-        # If no economy data exists for the user, create it
-        if not economy_data:
-            starting_balance = guild_data["economy"]["starting_balance"]
-            economy_data = {
-                "_id": ctx.author.id,
-                "balance": starting_balance,
-                "bank": 0,
-                "last_daily": 0,
-                "last_work": 0,
-                "inventory": {}
-            }
+        # Get user economy data, creating it if it doesn't exist
+        starting_balance = guild_data["economy"]["starting_balance"]
+        economy_data = await db.get_or_create_economy(ctx.author.id, starting_balance)
         
         # Check if user has enough money
         if economy_data.get("balance", 0) < item["price"]:
@@ -0,0 +1,16 @@
+# DiscordBotPro regex worker
+# Purge filters are searched in a separate process so a pattern that backtracks
+# catastrophically can be killed without stalling the event loop
+
+import re
+
+PATTERN_CACHE_SIZE = 64
+patterns = {}  # (source, flags) -> compiled pattern, per worker process
+
+def search_pattern(source: str, flags: int, content: str) -> bool:
+    pattern = patterns.get((source, flags))
+    if pattern is None:
+        if len(patterns) >= PATTERN_CACHE_SIZE:
+            patterns.clear()
+        pattern = patterns[(source, flags)] = re.compile(source, flags)
+    return pattern.search(content) is not None
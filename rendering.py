@@ -0,0 +1,96 @@
+# DiscordBotPro rendering workers
+# Everything here runs inside the rank card process pool, which stats charts share.
+# The pool starts workers with forkserver or spawn, so the functions it calls must
+# live in an importable module
+
+import datetime
+import itertools
+from io import BytesIO
+from typing import Optional, List, Dict
+from PIL import Image, ImageDraw, ImageFont
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+DEFAULT_RANK_CARD_FONT = 'DejaVuSans-Bold.ttf'
+RANK_CARD_SIZE = (500, 150)
+
+# Rank Cards
+# Worker-process state, loaded once per worker by init_rank_card_worker
+rank_card_assets = {}
+
+def init_rank_card_worker(font_path: str = DEFAULT_RANK_CARD_FONT):
+    def load_font(size):
+        try:
+            return ImageFont.truetype(font_path, size)
+        except OSError:
+            return ImageFont.load_default()
+    
+    background = Image.new('RGBA', RANK_CARD_SIZE, (44, 47, 51, 255))
+    draw = ImageDraw.Draw(background)
+    draw.rounded_rectangle((150, 100, 480, 120), radius=10, fill=(72, 75, 78, 255))
+    
+    avatar_mask = Image.new('L', (110, 110), 0)
+    ImageDraw.Draw(avatar_mask).ellipse((0, 0, 110, 110), fill=255)
+    
+    rank_card_assets.update({
+        "background": background,
+        "avatar_mask": avatar_mask,
+        "title_font": load_font(28),
+        "body_font": load_font(18)
+    })
+    return rank_card_assets
+
+def generate_level_image(name: str, avatar: Optional[bytes], level: int, progress: float, progress_text: str) -> bytes:
+    # Runs inside a worker process; returns PNG bytes so the result pickles cheaply
+    assets = rank_card_assets or init_rank_card_worker()
+    card = assets["background"].copy()
+    draw = ImageDraw.Draw(card)
+    
+    # Draw user avatar
+    if avatar:
+        avatar_image = Image.open(BytesIO(avatar)).convert('RGBA').resize((110, 110))
+        card.paste(avatar_image, (20, 20), assets["avatar_mask"])
+    
+    # Add username and level text
+    draw.text((150, 25), name[:24], font=assets["title_font"], fill=(255, 255, 255, 255))
+    draw.text((150, 68), f"Level {level}", font=assets["body_font"], fill=(185, 187, 190, 255))
+    draw.text((480, 68), progress_text, font=assets["body_font"], fill=(185, 187, 190, 255), anchor="ra")
+    
+    # Draw XP bar
+    if progress > 0:
+        draw.rounded_rectangle((150, 100, 150 + max(20, int(330 * progress)), 120), radius=10, fill=(52, 152, 219, 255))
+    
+    buffer = BytesIO()
+    card.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+# Server Stats Charts
+def generate_stats_chart(title: str, timestamps: List[datetime.datetime], series: Dict[str, List[int]], date_format: str) -> bytes:
+    # Runs inside a worker process on its own Figure and Agg canvas; pyplot's global state is never used
+    figure = Figure(figsize=(8, 1.8 * len(series) + 0.8), dpi=100, facecolor="#2c2f33")
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(len(series), 1, sharex=True, squeeze=False)[:, 0]
+    
+    # Bars start at their bucket and span most of it; widths are in days on a date axis
+    step = (timestamps[1] - timestamps[0]).total_seconds() if len(timestamps) > 1 else 3600
+    width = step / 86400 * 0.85
+    colors = itertools.cycle(("#3498db", "#2ecc71", "#f1c40f"))
+    
+    for ax, (name, values), color in zip(axes, series.items(), colors):
+        ax.set_facecolor("#23272a")
+        ax.bar(timestamps, values, width=width, align="edge", color=color)
+        ax.set_ylabel(name.upper() if name == "xp" else name.title(), color="#b9bbbe")
+        ax.tick_params(colors="#b9bbbe", labelsize=8)
+        ax.grid(axis="y", color="#40444b", linewidth=0.5)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+    
+    axes[-1].xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    figure.suptitle(title, color="white")
+    figure.autofmt_xdate()
+    figure.tight_layout()
+    
+    buffer = BytesIO()
+    figure.savefig(buffer, format="png", facecolor=figure.get_facecolor())
+    return buffer.getvalue()
@@ -0,0 +1,1167 @@
+# DiscordBotPro storage backends
+# Database in botquestionmark.py is written against StorageBackend; MongoStorage is the
+# default and SQLiteStorage serves single-process deployments
+
+import abc
+import asyncio
+import copy
+import datetime
+import json
+import logging
+import sqlite3
+try:
+    import motor.motor_asyncio
+    from pymongo import ReturnDocument, UpdateOne, IndexModel, ASCENDING, DESCENDING
+    from pymongo.errors import PyMongoError
+except ImportError:  # only MongoStorage needs the driver
+    motor = None
+    ASCENDING, DESCENDING = 1, -1  # pymongo's values, the index specs below are plain data
+from typing import List
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('DiscordBotPro')
+
+# Index Management
+def planned_query(*sample_args):
+    # Marks a MongoStorage read; IndexManager replays it with sample_args and explains what it issued
+    def decorator(method):
+        method.plan_args = sample_args
+        return method
+    return decorator
+
+class QueryRecorder:
+    """Stands in for a collection and records the filter and sort of every read issued against it"""
+    def __init__(self, name: str, queries: list):
+        self.name = name
+        self.queries = queries
+    
+    def record(self, query):
+        self.queries.append([self.name, query or {}, None])
+    
+    def find(self, query=None, *args, **kwargs):
+        self.record(query)
+        return self
+    
+    def sort(self, key, direction=None):
+        self.queries[-1][2] = key if isinstance(key, list) else [(key, direction)]
+        return self
+    
+    def limit(self, limit: int):
+        return self
+    
+    async def to_list(self, length=None):
+        return []
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        raise StopAsyncIteration
+    
+    async def find_one(self, query=None, *args, **kwargs):
+        self.record(query)
+        return None
+    
+    async def count_documents(self, query, *args, **kwargs):
+        self.record(query)
+        return 0
+
+class IndexManager:
+    """Declares the indexes MongoStorage reads rely on and explains every @planned_query read"""
+    # collection -> list of (keys, options)
+    INDEXES = {
+        "leveling": [
+            # Not unique: older deployments can hold duplicate (user_id, guild_id) documents,
+            # which would make the index build fail at startup
+            ([("user_id", ASCENDING), ("guild_id", ASCENDING)], {"name": "user_guild"}),
+            ([("guild_id", ASCENDING), ("xp", DESCENDING)], {"name": "guild_xp"})
+        ],
+        "moderation": [
+            ([("user_id", ASCENDING), ("guild_id", ASCENDING), ("timestamp", DESCENDING), ("case_id", DESCENDING)], {"name": "user_guild_timestamp_case"}),
+            ([("guild_id", ASCENDING), ("case_id", ASCENDING)], {"name": "guild_case"})
+        ],
+        "tickets": [
+            ([("guild_id", ASCENDING)], {"name": "guild"})
+        ],
+        "premium": [
+            ([("active", ASCENDING), ("expiry", ASCENDING)], {"name": "active_expiry"})
+        ],
+        "stats": [
+            ([("type", ASCENDING), ("timestamp", ASCENDING)], {"name": "type_timestamp"})
+        ],
+        "guild_stats": [
+            ([("guild_id", ASCENDING), ("timestamp", ASCENDING)], {"name": "guild_timestamp"})
+        ],
+        "users": [
+            ([("afk", ASCENDING)], {"name": "afk", "partialFilterExpression": {"afk": {"$type": "object"}}})
+        ]
+    }
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.ensured = False
+    
+    async def ensure_indexes(self):
+        for collection_name, indexes in self.INDEXES.items():
+            models = [IndexModel(keys, **options) for keys, options in indexes]
+            try:
+                await self.storage.db[collection_name].create_indexes(models)
+            except PyMongoError as e:
+                logger.error(f"Failed to create indexes on {collection_name}: {e}")
+        self.ensured = True
+        logger.info("Database indexes ensured")
+    
+    def find_stages(self, plan, stage: str) -> bool:
+        if isinstance(plan, dict):
+            if plan.get("stage") == stage:
+                return True
+            return any(self.find_stages(value, stage) for value in plan.values())
+        if isinstance(plan, list):
+            return any(self.find_stages(value, stage) for value in plan)
+        return False
+    
+    async def record_queries(self, name: str, method) -> List[list]:
+        # Runs the read against recorders swapped in for every collection attribute
+        queries = []
+        recorder = copy.copy(self.storage)
+        for attribute, value in vars(self.storage).items():
+            if isinstance(value, motor.motor_asyncio.AsyncIOMotorCollection):
+                setattr(recorder, attribute, QueryRecorder(value.name, queries))
+        await method(recorder, *method.plan_args)
+        return queries
+    
+    async def verify_query_plans(self) -> List[str]:
+        # Returns the storage reads whose winning plan still contains a COLLSCAN
+        collscans = []
+        for name, method in list(vars(type(self.storage)).items()):
+            if not hasattr(method, "plan_args"):
+                if name.startswith(("find_", "count_")):
+                    logger.warning(f"{type(self.storage).__name__}.{name} has no @planned_query, its plan is not checked")
+                continue
+            
+            for collection_name, query, sort in await self.record_queries(name, method):
+                cursor = self.storage.db[collection_name].find(query)
+                if sort:
+                    cursor = cursor.sort(sort)
+                try:
+                    explain = await cursor.explain()
+                except PyMongoError as e:
+                    logger.error(f"Failed to explain {name}: {e}")
+                    continue
+                
+                if self.find_stages(explain.get("queryPlanner", {}).get("winningPlan", {}), "COLLSCAN"):
+                    collscans.append(name)
+                    logger.warning(f"Query plan for {type(self.storage).__name__}.{name} on {collection_name} uses a COLLSCAN")
+        
+        if not collscans:
+            logger.info("All storage query plans use indexes")
+        return collscans
+
+# Storage Backends
+class StorageBackend(abc.ABC):
+    """Persistence primitives that Database is written against"""
+    name = "base"
+    
+    async def prepare(self):
+        pass
+    
+    async def close(self):
+        pass
+    
+    # Users
+    @abc.abstractmethod
+    async def find_user(self, user_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_user(self, user_id: int, data: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_afk_users(self) -> dict:
+        raise NotImplementedError
+    
+    async def watch_afk_changes(self):
+        # Optional: yields (user_id, afk) for changes made by other processes; afk is None for deleted users
+        raise NotImplementedError
+        yield
+    
+    # Guilds
+    @abc.abstractmethod
+    async def find_guild(self, guild_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_guild_if_changed(self, guild_id: int, version: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_guild(self, guild_id: int, data: dict) -> dict:
+        # Must bump _version and return the updated document
+        raise NotImplementedError
+    
+    async def watch_guild_changes(self):
+        # Optional: yields (guild_id, version); version is None for deletes, (None, None) means drop everything cached
+        raise NotImplementedError
+        yield
+    
+    # Economy
+    @abc.abstractmethod
+    async def find_economy(self, user_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_economy(self, user_id: int, data: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def create_economy(self, user_id: int, defaults: dict) -> dict:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def claim_economy(self, user_id: int, field: str, ready_before: float, amount: int, now: float):
+        # Returns the updated document, or None if on cooldown or missing
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def move_economy(self, user_id: int, source: str, target: str, amount: int = None, divisor: int = 1):
+        # Returns the document as it was before the move, or None if nothing moved
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def debit_economy(self, user_id: int, amount: int, item_id: str = None):
+        # Returns the updated document, or None if the wallet cannot cover amount
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def credit_economy(self, user_id: int, amount: int, defaults: dict) -> dict:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def increment_balance(self, user_id: int, amount: int):
+        raise NotImplementedError
+    
+    # Leveling
+    @abc.abstractmethod
+    async def find_level(self, user_id: int, guild_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_level(self, user_id: int, guild_id: int, data: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_guild_levels(self, guild_id: int) -> List[dict]:
+        # {"user_id", "xp"} documents sorted by xp descending
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def apply_level_deltas(self, deltas: List[tuple]):
+        # (user_id, guild_id, xp_delta, level, last_message) applied as one batch
+        raise NotImplementedError
+    
+    # Premium
+    @abc.abstractmethod
+    async def find_premium(self, guild_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_premium(self, guild_id: int, data: dict) -> dict:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_active_premium(self, min_expiry: float = None) -> List[dict]:
+        raise NotImplementedError
+    
+    # Tickets
+    @abc.abstractmethod
+    async def find_ticket(self, ticket_id: str):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def set_ticket(self, ticket_id: str, data: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_guild_tickets(self, guild_id: int, limit: int) -> List[dict]:
+        raise NotImplementedError
+    
+    # Moderation
+    @abc.abstractmethod
+    async def find_case(self, case_id: int, guild_id: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def insert_case(self, case_data: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def insert_cases(self, cases: List[dict]):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_user_cases(self, user_id: int, guild_id: int, limit: int, before: tuple = None) -> List[dict]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def count_user_cases(self, user_id: int, guild_id: int) -> int:
+        raise NotImplementedError
+    
+    # Counters
+    @abc.abstractmethod
+    async def max_counter(self, name: str, value: int):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def increment_counter(self, name: str, amount: int) -> int:
+        raise NotImplementedError
+    
+    # Stats
+    @abc.abstractmethod
+    async def apply_stat_deltas(self, totals: dict, buckets: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_stats(self):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_stat_buckets(self, since: float, until: float = None) -> List[dict]:
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def apply_guild_stat_deltas(self, buckets: dict):
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    async def find_guild_stat_buckets(self, guild_id: int, since: float, until: float = None) -> List[dict]:
+        raise NotImplementedError
+
+class MongoStorage(StorageBackend):
+    name = "mongo"
+    
+    def __init__(self, uri: str, database_name: str = "discord_bot"):
+        if motor is None:
+            raise RuntimeError("MongoStorage needs the motor and pymongo packages, install them or set STORAGE_BACKEND=sqlite")
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+        self.db = self.client[database_name]
+        self.users = self.db.users
+        self.guilds = self.db.guilds
+        self.economy = self.db.economy
+        self.leveling = self.db.leveling
+        self.music = self.db.music
+        self.tickets = self.db.tickets
+        self.moderation = self.db.moderation
+        self.premium = self.db.premium
+        self.stats = self.db.stats
+        self.guild_stats = self.db.guild_stats
+        self.counters = self.db.counters
+        self.indexes = IndexManager(self)
+        logger.info("Connected to MongoDB")
+    
+    async def prepare(self):
+        # Make sure every query has its index before serving traffic
+        await self.indexes.ensure_indexes()
+        await self.indexes.verify_query_plans()
+    
+    async def close(self):
+        self.client.close()
+    
+    @planned_query(0)
+    async def find_user(self, user_id: int):
+        return await self.users.find_one({"_id": user_id})
+    
+    async def set_user(self, user_id: int, data: dict):
+        await self.users.update_one({"_id": user_id}, {"$set": data}, upsert=True)
+    
+    @planned_query()
+    async def find_afk_users(self) -> dict:
+        registry = {}
+        async for user_data in self.users.find({"afk": {"$type": "object"}}, {"afk": 1}):
+            registry[user_data["_id"]] = user_data["afk"]
+        return registry
+    
+    async def watch_afk_changes(self):
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace", "delete"]}},
+            {"updateDescription.updatedFields.afk": {"$exists": True}}
+        ]}}]
+        async with self.users.watch(pipeline) as stream:
+            async for change in stream:
+                user_id = change.get("documentKey", {}).get("_id")
+                if change.get("operationType") == "delete":
+                    yield user_id, None
+                elif "fullDocument" in change:
+                    yield user_id, (change["fullDocument"] or {}).get("afk")
+                else:
+                    yield user_id, change["updateDescription"]["updatedFields"].get("afk")
+    
+    @planned_query(0)
+    async def find_guild(self, guild_id: int):
+        return await self.guilds.find_one({"_id": guild_id})
+    
+    @planned_query(0, 0)
+    async def find_guild_if_changed(self, guild_id: int, version: int):
+        return await self.guilds.find_one({"_id": guild_id, "_version": {"$ne": version}})
+    
+    async def set_guild(self, guild_id: int, data: dict) -> dict:
+        return await self.guilds.find_one_and_update(
+            {"_id": guild_id},
+            {"$set": data, "$inc": {"_version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def watch_guild_changes(self):
+        async with self.guilds.watch() as stream:
+            yield None, None
+            async for change in stream:
+                if change.get("operationType") in ("drop", "rename", "dropDatabase", "invalidate"):
+                    yield None, None
+                    continue
+                guild_id = change.get("documentKey", {}).get("_id")
+                if guild_id is None:
+                    continue
+                if change.get("operationType") == "delete":
+                    # No version survives a delete, so the cached entry is always evicted
+                    yield guild_id, None
+                else:
+                    updated = change.get("updateDescription", {}).get("updatedFields", {})
+                    yield guild_id, updated.get("_version")
+    
+    @planned_query(0)
+    async def find_economy(self, user_id: int):
+        return await self.economy.find_one({"_id": user_id})
+    
+    async def set_economy(self, user_id: int, data: dict):
+        await self.economy.update_one({"_id": user_id}, {"$set": data}, upsert=True)
+    
+    async def create_economy(self, user_id: int, defaults: dict) -> dict:
+        return await self.economy.find_one_and_update(
+            {"_id": user_id},
+            {"$setOnInsert": defaults},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def claim_economy(self, user_id: int, field: str, ready_before: float, amount: int, now: float):
+        # The cooldown check lives in the filter
+        return await self.economy.find_one_and_update(
+            {"_id": user_id, field: {"$not": {"$gt": ready_before}}},
+            {"$inc": {"balance": amount}, "$set": {field: now}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def move_economy(self, user_id: int, source: str, target: str, amount: int = None, divisor: int = 1):
+        if amount is None:
+            available = {"$ifNull": ["$" + source, 0]}
+            portion = {"$toLong": {"$floor": {"$divide": [available, divisor]}}}
+            query = {"_id": user_id}
+            update = [{"$set": {
+                source: {"$subtract": [available, portion]},
+                target: {"$add": [{"$ifNull": ["$" + target, 0]}, portion]}
+            }}]
+        else:
+            query = {"_id": user_id, source: {"$gte": amount}}
+            update = {"$inc": {source: -amount, target: amount}}
+        return await self.economy.find_one_and_update(query, update, return_document=ReturnDocument.BEFORE)
+    
+    async def debit_economy(self, user_id: int, amount: int, item_id: str = None):
+        update = {"$inc": {"balance": -amount}}
+        if item_id is not None:
+            update["$inc"][f"inventory.{item_id}"] = 1
+        return await self.economy.find_one_and_update(
+            {"_id": user_id, "balance": {"$gte": amount}},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def credit_economy(self, user_id: int, amount: int, defaults: dict) -> dict:
+        # Single upsert that also creates the account with its starting balance
+        return await self.economy.find_one_and_update(
+            {"_id": user_id},
+            [{"$set": {
+                "balance": {"$add": [{"$ifNull": ["$balance", defaults["balance"]]}, amount]},
+                "bank": {"$ifNull": ["$bank", defaults["bank"]]},
+                "last_daily": {"$ifNull": ["$last_daily", defaults["last_daily"]]},
+                "last_work": {"$ifNull": ["$last_work", defaults["last_work"]]},
+                "inventory": {"$ifNull": ["$inventory", {"$literal": defaults["inventory"]}]}
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def increment_balance(self, user_id: int, amount: int):
+        await self.economy.update_one({"_id": user_id}, {"$inc": {"balance": amount}})
+    
+    @planned_query(0, 0)
+    async def find_level(self, user_id: int, guild_id: int):
+        return await self.leveling.find_one({"user_id": user_id, "guild_id": guild_id})
+    
+    async def set_level(self, user_id: int, guild_id: int, data: dict):
+        await self.leveling.update_one(
+            {"user_id": user_id, "guild_id": guild_id},
+            {"$set": data},
+            upsert=True
+        )
+    
+    @planned_query(0)
+    async def find_guild_levels(self, guild_id: int) -> List[dict]:
+        return await self.leveling.find(
+            {"guild_id": guild_id},
+            {"_id": 0, "user_id": 1, "xp": 1}
+        ).sort("xp", DESCENDING).to_list(length=None)
+    
+    async def apply_level_deltas(self, deltas: List[tuple]):
+        await self.leveling.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "guild_id": guild_id},
+                {
+                    # $inc/$max keep concurrent writers from other processes intact
+                    "$inc": {"xp": xp},
+                    "$max": {"level": level, "last_message": last_message}
+                },
+                upsert=True
+            )
+            for user_id, guild_id, xp, level, last_message in deltas
+        ], ordered=False)
+    
+    @planned_query(0)
+    async def find_premium(self, guild_id: int):
+        return await self.premium.find_one({"_id": guild_id})
+    
+    async def set_premium(self, guild_id: int, data: dict) -> dict:
+        return await self.premium.find_one_and_update(
+            {"_id": guild_id},
+            {"$set": data},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    @planned_query(0)
+    async def find_active_premium(self, min_expiry: float = None) -> List[dict]:
+        query = {"active": True}
+        if min_expiry is not None:
+            query["expiry"] = {"$gt": min_expiry}
+        return await self.premium.find(query).to_list(length=None)
+    
+    @planned_query("")
+    async def find_ticket(self, ticket_id: str):
+        return await self.tickets.find_one({"_id": ticket_id})
+    
+    async def set_ticket(self, ticket_id: str, data: dict):
+        await self.tickets.update_one({"_id": ticket_id}, {"$set": data}, upsert=True)
+    
+    @planned_query(0, 1)
+    async def find_guild_tickets(self, guild_id: int, limit: int) -> List[dict]:
+        return await self.tickets.find({"guild_id": guild_id}).to_list(length=limit)
+    
+    @planned_query(0, 0)
+    async def find_case(self, case_id: int, guild_id: int):
+        return await self.moderation.find_one({"case_id": case_id, "guild_id": guild_id})
+    
+    async def insert_case(self, case_data: dict):
+        await self.moderation.insert_one(case_data)
+    
+    async def insert_cases(self, cases: List[dict]):
+        await self.moderation.insert_many(cases, ordered=False)
+    
+    @planned_query(0, 0, 1, (0, 0))
+    async def find_user_cases(self, user_id: int, guild_id: int, limit: int, before: tuple = None) -> List[dict]:
+        query = {"user_id": user_id, "guild_id": guild_id}
+        if before is not None:
+            timestamp, case_id = before
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "case_id": {"$lt": case_id}}
+            ]
+        return await self.moderation.find(
+            query,
+            {"_id": 0, "case_id": 1, "action": 1, "reason": 1, "timestamp": 1}
+        ).sort([("timestamp", DESCENDING), ("case_id", DESCENDING)]).limit(limit).to_list(length=limit)
+    
+    @planned_query(0, 0)
+    async def count_user_cases(self, user_id: int, guild_id: int) -> int:
+        return await self.moderation.count_documents({"user_id": user_id, "guild_id": guild_id})
+    
+    async def max_counter(self, name: str, value: int):
+        await self.counters.update_one({"_id": name}, {"$max": {"value": value}}, upsert=True)
+    
+    async def increment_counter(self, name: str, amount: int) -> int:
+        counter = await self.counters.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"value": amount}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["value"]
+    
+    async def apply_stat_deltas(self, totals: dict, buckets: dict):
+        operations = [UpdateOne({"_id": "bot_stats"}, {"$inc": totals}, upsert=True)]
+        for bucket, counters in buckets.items():
+            operations.append(UpdateOne(
+                {"_id": f"minute:{bucket}"},
+                {
+                    "$inc": counters,
+                    "$setOnInsert": {
+                        "type": "minute",
+                        "timestamp": datetime.datetime.utcfromtimestamp(bucket)
+                    }
+                },
+                upsert=True
+            ))
+        await self.stats.bulk_write(operations, ordered=False)
+    
+    @planned_query()
+    async def find_stats(self):
+        return await self.stats.find_one({"_id": "bot_stats"})
+    
+    @planned_query(0, 60)
+    async def find_stat_buckets(self, since: float, until: float = None) -> List[dict]:
+        query = {"type": "minute", "timestamp": {"$gte": datetime.datetime.utcfromtimestamp(since)}}
+        if until is not None:
+            query["timestamp"]["$lt"] = datetime.datetime.utcfromtimestamp(until)
+        return await self.stats.find(query).sort("timestamp", 1).to_list(length=None)
+    
+    async def apply_guild_stat_deltas(self, buckets: dict):
+        operations = [
+            UpdateOne(
+                {"_id": f"{guild_id}:{bucket}"},
+                {
+                    "$inc": counters,
+                    "$setOnInsert": {
+                        "guild_id": guild_id,
+                        "timestamp": datetime.datetime.utcfromtimestamp(bucket)
+                    }
+                },
+                upsert=True
+            )
+            for (guild_id, bucket), counters in buckets.items()
+        ]
+        if operations:
+            await self.guild_stats.bulk_write(operations, ordered=False)
+    
+    @planned_query(0, 0, 3600)
+    async def find_guild_stat_buckets(self, guild_id: int, since: float, until: float = None) -> List[dict]:
+        query = {"guild_id": guild_id, "timestamp": {"$gte": datetime.datetime.utcfromtimestamp(since)}}
+        if until is not None:
+            query["timestamp"]["$lt"] = datetime.datetime.utcfromtimestamp(until)
+        return await self.guild_stats.find(query).sort("timestamp", 1).to_list(length=None)
+
+class SQLiteStorage(StorageBackend):
+    """Single-file backend for small deployments and Mongo-free benchmarking"""
+    name = "sqlite"
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, afk TEXT, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS users_afk ON users (id) WHERE afk IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS guilds (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS economy (
+            id INTEGER PRIMARY KEY, balance INTEGER NOT NULL, bank INTEGER NOT NULL,
+            last_daily REAL NOT NULL, last_work REAL NOT NULL, inventory TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leveling (
+            user_id INTEGER NOT NULL, guild_id INTEGER NOT NULL, xp INTEGER NOT NULL,
+            level INTEGER NOT NULL, last_message REAL NOT NULL, PRIMARY KEY (user_id, guild_id)
+        );
+        CREATE INDEX IF NOT EXISTS leveling_guild_xp ON leveling (guild_id, xp DESC);
+        CREATE TABLE IF NOT EXISTS premium (id INTEGER PRIMARY KEY, active INTEGER NOT NULL, expiry REAL NOT NULL, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS premium_active_expiry ON premium (active, expiry);
+        CREATE TABLE IF NOT EXISTS tickets (id TEXT PRIMARY KEY, guild_id INTEGER, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS tickets_guild ON tickets (guild_id);
+        CREATE TABLE IF NOT EXISTS moderation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER,
+            case_id INTEGER, timestamp REAL, data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS moderation_user_guild_timestamp_case ON moderation (user_id, guild_id, timestamp DESC, case_id DESC);
+        CREATE INDEX IF NOT EXISTS moderation_guild_case ON moderation (guild_id, case_id);
+        CREATE TABLE IF NOT EXISTS counters (id TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS stat_buckets (
+            bucket INTEGER NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (bucket, name)
+        );
+        CREATE TABLE IF NOT EXISTS guild_stat_buckets (
+            guild_id INTEGER NOT NULL, bucket INTEGER NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, bucket, name)
+        );
+    """
+    
+    ECONOMY_FIELDS = ("balance", "bank", "last_daily", "last_work", "inventory")
+    COOLDOWN_FIELDS = ("last_daily", "last_work")
+    WALLET_FIELDS = ("balance", "bank")
+    
+    def __init__(self, path: str):
+        self.path = path
+        # One dedicated thread owns the connection, so statements never interleave
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+        self.connection = None
+    
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(self.SCHEMA)
+            logger.info(f"Opened SQLite storage at {self.path}")
+        return self.connection
+    
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: function(self.connect(), *args))
+    
+    @contextmanager
+    def transaction(self, connection):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    
+    def encode(self, document) -> str:
+        def encode_value(value):
+            if isinstance(value, datetime.datetime):
+                return {"$date": value.isoformat()}
+            raise TypeError(f"Cannot store {type(value).__name__}")
+        return json.dumps(document, default=encode_value)
+    
+    def decode(self, text):
+        def decode_value(value):
+            if len(value) == 1 and "$date" in value:
+                return datetime.datetime.fromisoformat(value["$date"])
+            return value
+        return json.loads(text, object_hook=decode_value) if text is not None else None
+    
+    async def prepare(self):
+        await self.run(lambda connection: None)
+    
+    async def close(self):
+        def close_connection(connection):
+            connection.close()
+            self.connection = None
+        if self.connection is not None:
+            await self.run(close_connection)
+        self.executor.shutdown(wait=True)
+    
+    # Users
+    def read_user(self, connection, user_id):
+        row = connection.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return dict(self.decode(row["data"]), _id=user_id) if row else None
+    
+    async def find_user(self, user_id: int):
+        return await self.run(self.read_user, user_id)
+    
+    async def set_user(self, user_id: int, data: dict):
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_user(connection, user_id) or {}
+                document.update(data)
+                document.pop("_id", None)
+                afk = self.encode(document["afk"]) if document.get("afk") else None
+                connection.execute(
+                    "INSERT INTO users (id, afk, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET afk = excluded.afk, data = excluded.data",
+                    (user_id, afk, self.encode(document))
+                )
+        await self.run(write)
+    
+    async def find_afk_users(self) -> dict:
+        def read(connection):
+            rows = connection.execute("SELECT id, afk FROM users WHERE afk IS NOT NULL").fetchall()
+            return {row["id"]: self.decode(row["afk"]) for row in rows}
+        return await self.run(read)
+    
+    # Guilds
+    def read_guild(self, connection, guild_id, version=None):
+        if version is None:
+            row = connection.execute("SELECT version, data FROM guilds WHERE id = ?", (guild_id,)).fetchone()
+        else:
+            row = connection.execute("SELECT version, data FROM guilds WHERE id = ? AND version != ?", (guild_id, version)).fetchone()
+        if row is None:
+            return None
+        return dict(self.decode(row["data"]), _id=guild_id, _version=row["version"])
+    
+    async def find_guild(self, guild_id: int):
+        return await self.run(self.read_guild, guild_id)
+    
+    async def find_guild_if_changed(self, guild_id: int, version: int):
+        return await self.run(self.read_guild, guild_id, version)
+    
+    async def set_guild(self, guild_id: int, data: dict) -> dict:
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_guild(connection, guild_id) or {"_version": 0}
+                document.update(data)
+                version = document.pop("_version") + 1
+                document.pop("_id", None)
+                connection.execute(
+                    "INSERT INTO guilds (id, version, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET version = excluded.version, data = excluded.data",
+                    (guild_id, version, self.encode(document))
+                )
+                return dict(document, _id=guild_id, _version=version)
+        return await self.run(write)
+    
+    # Economy
+    def read_economy(self, connection, user_id):
+        row = connection.execute(
+            "SELECT balance, bank, last_daily, last_work, inventory FROM economy WHERE id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        document = {"_id": user_id}
+        for field in self.ECONOMY_FIELDS:
+            document[field] = self.decode(row[field]) if field == "inventory" else row[field]
+        return document
+    
+    def write_economy(self, connection, user_id, document):
+        values = [self.encode(document[field]) if field == "inventory" else document[field] for field in self.ECONOMY_FIELDS]
+        connection.execute(
+            "INSERT INTO economy (id, balance, bank, last_daily, last_work, inventory) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET balance = excluded.balance, bank = excluded.bank, "
+            "last_daily = excluded.last_daily, last_work = excluded.last_work, inventory = excluded.inventory",
+            (user_id, *values)
+        )
+    
+    async def find_economy(self, user_id: int):
+        return await self.run(self.read_economy, user_id)
+    
+    async def set_economy(self, user_id: int, data: dict):
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_economy(connection, user_id) or {
+                    "balance": 0, "bank": 0, "last_daily": 0, "last_work": 0, "inventory": {}
+                }
+                document.update({field: data[field] for field in self.ECONOMY_FIELDS if field in data})
+                self.write_economy(connection, user_id, document)
+        await self.run(write)
+    
+    async def create_economy(self, user_id: int, defaults: dict) -> dict:
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_economy(connection, user_id)
+                if document is None:
+                    self.write_economy(connection, user_id, defaults)
+                    document = dict(defaults, _id=user_id)
+                return document
+        return await self.run(write)
+    
+    async def claim_economy(self, user_id: int, field: str, ready_before: float, amount: int, now: float):
+        if field not in self.COOLDOWN_FIELDS:
+            raise ValueError(f"Unknown cooldown field {field}")
+        def write(connection):
+            with self.transaction(connection):
+                cursor = connection.execute(
+                    f"UPDATE economy SET balance = balance + ?, {field} = ? WHERE id = ? AND {field} <= ?",
+                    (amount, now, user_id, ready_before)
+                )
+                return self.read_economy(connection, user_id) if cursor.rowcount else None
+        return await self.run(write)
+    
+    async def move_economy(self, user_id: int, source: str, target: str, amount: int = None, divisor: int = 1):
+        if source not in self.WALLET_FIELDS or target not in self.WALLET_FIELDS:
+            raise ValueError(f"Cannot move funds from {source} to {target}")
+        def write(connection):
+            with self.transaction(connection):
+                before = self.read_economy(connection, user_id)
+                if before is None:
+                    return None
+                moved = before[source] // divisor if amount is None else amount
+                if before[source] < moved:
+                    return None
+                connection.execute(
+                    f"UPDATE economy SET {source} = {source} - ?, {target} = {target} + ? WHERE id = ?",
+                    (moved, moved, user_id)
+                )
+                return before
+        return await self.run(write)
+    
+    async def debit_economy(self, user_id: int, amount: int, item_id: str = None):
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_economy(connection, user_id)
+                if document is None or document["balance"] < amount:
+                    return None
+                document["balance"] -= amount
+                if item_id is not None:
+                    document["inventory"][item_id] = document["inventory"].get(item_id, 0) + 1
+                self.write_economy(connection, user_id, document)
+                return document
+        return await self.run(write)
+    
+    async def credit_economy(self, user_id: int, amount: int, defaults: dict) -> dict:
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_economy(connection, user_id) or dict(defaults, _id=user_id)
+                document["balance"] += amount
+                self.write_economy(connection, user_id, document)
+                return document
+        return await self.run(write)
+    
+    async def increment_balance(self, user_id: int, amount: int):
+        await self.run(lambda connection: connection.execute(
+            "UPDATE economy SET balance = balance + ? WHERE id = ?", (amount, user_id)
+        ))
+    
+    # Leveling
+    async def find_level(self, user_id: int, guild_id: int):
+        def read(connection):
+            row = connection.execute(
+                "SELECT xp, level, last_message FROM leveling WHERE user_id = ? AND guild_id = ?",
+                (user_id, guild_id)
+            ).fetchone()
+            return dict(row, user_id=user_id, guild_id=guild_id) if row else None
+        return await self.run(read)
+    
+    async def set_level(self, user_id: int, guild_id: int, data: dict):
+        def write(connection):
+            with self.transaction(connection):
+                row = connection.execute(
+                    "SELECT xp, level, last_message FROM leveling WHERE user_id = ? AND guild_id = ?",
+                    (user_id, guild_id)
+                ).fetchone()
+                document = dict(row) if row else {"xp": 0, "level": 0, "last_message": 0}
+                document.update({field: data[field] for field in ("xp", "level", "last_message") if field in data})
+                connection.execute(
+                    "INSERT OR REPLACE INTO leveling (user_id, guild_id, xp, level, last_message) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, guild_id, document["xp"], document["level"], document["last_message"])
+                )
+        await self.run(write)
+    
+    async def find_guild_levels(self, guild_id: int) -> List[dict]:
+        def read(connection):
+            rows = connection.execute(
+                "SELECT user_id, xp FROM leveling WHERE guild_id = ? ORDER BY xp DESC",
+                (guild_id,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        return await self.run(read)
+    
+    async def apply_level_deltas(self, deltas: List[tuple]):
+        def write(connection):
+            with self.transaction(connection):
+                connection.executemany(
+                    "INSERT INTO leveling (user_id, guild_id, xp, level, last_message) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, guild_id) DO UPDATE SET xp = xp + excluded.xp, "
+                    "level = max(level, excluded.level), last_message = max(last_message, excluded.last_message)",
+                    deltas
+                )
+        await self.run(write)
+    
+    # Premium
+    def read_premium(self, connection, guild_id):
+        row = connection.execute("SELECT data FROM premium WHERE id = ?", (guild_id,)).fetchone()
+        return dict(self.decode(row["data"]), _id=guild_id) if row else None
+    
+    async def find_premium(self, guild_id: int):
+        return await self.run(self.read_premium, guild_id)
+    
+    async def set_premium(self, guild_id: int, data: dict) -> dict:
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_premium(connection, guild_id) or {}
+                document.update(data)
+                document.pop("_id", None)
+                connection.execute(
+                    "INSERT INTO premium (id, active, expiry, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET active = excluded.active, expiry = excluded.expiry, data = excluded.data",
+                    (guild_id, int(bool(document.get("active", False))), document.get("expiry", 0), self.encode(document))
+                )
+                return dict(document, _id=guild_id)
+        return await self.run(write)
+    
+    async def find_active_premium(self, min_expiry: float = None) -> List[dict]:
+        def read(connection):
+            if min_expiry is None:
+                rows = connection.execute("SELECT id, data FROM premium WHERE active = 1").fetchall()
+            else:
+                rows = connection.execute("SELECT id, data FROM premium WHERE active = 1 AND expiry > ?", (min_expiry,)).fetchall()
+            return [dict(self.decode(row["data"]), _id=row["id"]) for row in rows]
+        return await self.run(read)
+    
+    # Tickets
+    def read_ticket(self, connection, ticket_id):
+        row = connection.execute("SELECT data FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return dict(self.decode(row["data"]), _id=ticket_id) if row else None
+    
+    async def find_ticket(self, ticket_id: str):
+        return await self.run(self.read_ticket, ticket_id)
+    
+    async def set_ticket(self, ticket_id: str, data: dict):
+        def write(connection):
+            with self.transaction(connection):
+                document = self.read_ticket(connection, ticket_id) or {}
+                document.update(data)
+                document.pop("_id", None)
+                connection.execute(
+                    "INSERT INTO tickets (id, guild_id, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET guild_id = excluded.guild_id, data = excluded.data",
+                    (ticket_id, document.get("guild_id"), self.encode(document))
+                )
+        await self.run(write)
+    
+    async def find_guild_tickets(self, guild_id: int, limit: int) -> List[dict]:
+        def read(connection):
+            rows = connection.execute("SELECT id, data FROM tickets WHERE guild_id = ? LIMIT ?", (guild_id, limit)).fetchall()
+            return [dict(self.decode(row["data"]), _id=row["id"]) for row in rows]
+        return await self.run(read)
+    
+    # Moderation
+    async def find_case(self, case_id: int, guild_id: int):
+        def read(connection):
+            row = connection.execute(
+                "SELECT data FROM moderation WHERE guild_id = ? AND case_id = ?",
+                (guild_id, case_id)
+            ).fetchone()
+            return self.decode(row["data"]) if row else None
+        return await self.run(read)
+    
+    async def insert_case(self, case_data: dict):
+        await self.insert_cases([case_data])
+    
+    async def insert_cases(self, cases: List[dict]):
+        def write(connection):
+            with self.transaction(connection):
+                connection.executemany(
+                    "INSERT INTO moderation (guild_id, user_id, case_id, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (case.get("guild_id"), case.get("user_id"), case.get("case_id"), case.get("timestamp"), self.encode(case))
+                        for case in cases
+                    ]
+                )
+        await self.run(write)
+    
+    async def find_user_cases(self, user_id: int, guild_id: int, limit: int, before: tuple = None) -> List[dict]:
+        def read(connection):
+            if before is None:
+                rows = connection.execute(
+                    "SELECT data FROM moderation WHERE user_id = ? AND guild_id = ? "
+                    "ORDER BY timestamp DESC, case_id DESC LIMIT ?",
+                    (user_id, guild_id, limit)
+                ).fetchall()
+            else:
+                timestamp, case_id = before
+                rows = connection.execute(
+                    "SELECT data FROM moderation WHERE user_id = ? AND guild_id = ? "
+                    "AND (timestamp < ? OR (timestamp = ? AND case_id < ?)) "
+                    "ORDER BY timestamp DESC, case_id DESC LIMIT ?",
+                    (user_id, guild_id, timestamp, timestamp, case_id, limit)
+                ).fetchall()
+            fields = ("case_id", "action", "reason", "timestamp")
+            cases = []
+            for row in rows:
+                case = self.decode(row["data"])
+                cases.append({field: case[field] for field in fields if field in case})
+            return cases
+        return await self.run(read)
+    
+    async def count_user_cases(self, user_id: int, guild_id: int) -> int:
+        def read(connection):
+            return connection.execute(
+                "SELECT COUNT(*) FROM moderation WHERE user_id = ? AND guild_id = ?",
+                (user_id, guild_id)
+            ).fetchone()[0]
+        return await self.run(read)
+    
+    # Counters
+    async def max_counter(self, name: str, value: int):
+        await self.run(lambda connection: connection.execute(
+            "INSERT INTO counters (id, value) VALUES (?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET value = max(value, excluded.value)",
+            (name, value)
+        ))
+    
+    async def increment_counter(self, name: str, amount: int) -> int:
+        def write(connection):
+            return connection.execute(
+                "INSERT INTO counters (id, value) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET value = value + excluded.value RETURNING value",
+                (name, amount)
+            ).fetchone()[0]
+        return await self.run(write)
+    
+    # Stats
+    async def apply_stat_deltas(self, totals: dict, buckets: dict):
+        def write(connection):
+            with self.transaction(connection):
+                connection.executemany(
+                    "INSERT INTO stats (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    list(totals.items())
+                )
+                connection.executemany(
+                    "INSERT INTO stat_buckets (bucket, name, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(bucket, name) DO UPDATE SET value = value + excluded.value",
+                    [(bucket, name, value) for bucket, counters in buckets.items() for name, value in counters.items()]
+                )
+        await self.run(write)
+    
+    async def find_stats(self):
+        def read(connection):
+            rows = connection.execute("SELECT name, value FROM stats").fetchall()
+            if not rows:
+                return None
+            return dict({row["name"]: row["value"] for row in rows}, _id="bot_stats")
+        return await self.run(read)
+    
+    async def find_stat_buckets(self, since: float, until: float = None) -> List[dict]:
+        def read(connection):
+            rows = connection.execute(
+                "SELECT bucket, name, value FROM stat_buckets WHERE bucket >= ? AND bucket < ? ORDER BY bucket",
+                (since, until if until is not None else float("inf"))
+            ).fetchall()
+            documents = {}
+            for row in rows:
+                bucket = row["bucket"]
+                if bucket not in documents:
+                    documents[bucket] = {
+                        "_id": f"minute:{bucket}",
+                        "type": "minute",
+                        "timestamp": datetime.datetime.utcfromtimestamp(bucket)
+                    }
+                documents[bucket][row["name"]] = row["value"]
+            return list(documents.values())
+        return await self.run(read)
+    
+    async def apply_guild_stat_deltas(self, buckets: dict):
+        def write(connection):
+            with self.transaction(connection):
+                connection.executemany(
+                    "INSERT INTO guild_stat_buckets (guild_id, bucket, name, value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(guild_id, bucket, name) DO UPDATE SET value = value + excluded.value",
+                    [
+                        (guild_id, bucket, name, value)
+                        for (guild_id, bucket), counters in buckets.items()
+                        for name, value in counters.items()
+                    ]
+                )
+        await self.run(write)
+    
+    async def find_guild_stat_buckets(self, guild_id: int, since: float, until: float = None) -> List[dict]:
+        def read(connection):
+            rows = connection.execute(
+                "SELECT bucket, name, value FROM guild_stat_buckets "
+                "WHERE guild_id = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (guild_id, since, until if until is not None else float("inf"))
+            ).fetchall()
+            documents = {}
+            for row in rows:
+                bucket = row["bucket"]
+                if bucket not in documents:
+                    documents[bucket] = {
+                        "_id": f"{guild_id}:{bucket}",
+                        "guild_id": guild_id,
+                        "timestamp": datetime.datetime.utcfromtimestamp(bucket)
+                    }
+                documents[bucket][row["name"]] = row["value"]
+            return list(documents.values())
+        return await self.run(read)
+
+def create_storage(backend: str, mongodb_uri: str = None, sqlite_path: str = "discord_bot.db") -> StorageBackend:
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path)
+    return MongoStorage(mongodb_uri)
@@ -0,0 +1,181 @@
+# Conformance checks every StorageBackend must pass, run against an empty store.
+# SQLite always runs, in memory and on disk; MongoDB runs against a scratch database when MONGODB_TEST_URI is set.
+
+import asyncio
+import datetime
+import os
+import time
+import uuid
+
+import pytest
+
+from storage import MongoStorage, SQLiteStorage, StorageBackend
+
+
+@pytest.fixture(params=["sqlite-memory", "sqlite-file", "mongo"])
+def backend(request, tmp_path):
+    if request.param == "sqlite-memory":
+        return lambda: SQLiteStorage(":memory:")
+    if request.param == "sqlite-file":
+        # WAL mode only applies to on-disk databases
+        return lambda: SQLiteStorage(str(tmp_path / "discord_bot.db"))
+    pytest.importorskip("motor")
+    uri = os.getenv("MONGODB_TEST_URI")
+    if not uri:
+        pytest.skip("MONGODB_TEST_URI is not set")
+    return lambda: MongoStorage(uri, f"discord_bot_test_{uuid.uuid4().hex}")
+
+
+def run(backend, check):
+    async def main():
+        storage = backend()
+        try:
+            await storage.prepare()
+            await check(storage)
+        finally:
+            if isinstance(storage, MongoStorage):
+                await storage.client.drop_database(storage.db.name)
+            await storage.close()
+    asyncio.run(main())
+
+
+def test_users_and_afk(backend):
+    async def check(storage):
+        now = time.time()
+        assert await storage.find_user(1) is None
+        await storage.set_user(1, {"afk": {"time": now, "reason": "lunch"}})
+        await storage.set_user(1, {"nickname": "tester"})
+        user = await storage.find_user(1)
+        assert user["afk"]["reason"] == "lunch" and user["nickname"] == "tester"
+        assert (await storage.find_afk_users())[1]["reason"] == "lunch"
+        await storage.set_user(1, {"afk": None})
+        assert 1 not in await storage.find_afk_users()
+    run(backend, check)
+
+
+def test_guild_versions(backend):
+    async def check(storage):
+        # Guilds bump their version on every write
+        first = await storage.set_guild(10, {"prefix": "!", "join_date": datetime.datetime(2025, 4, 18)})
+        second = await storage.set_guild(10, {"prefix": "?"})
+        assert second["_version"] == first["_version"] + 1
+        assert second["prefix"] == "?" and second["join_date"] == datetime.datetime(2025, 4, 18)
+        assert (await storage.find_guild(10))["_version"] == second["_version"]
+        assert await storage.find_guild_if_changed(10, second["_version"]) is None
+        assert (await storage.find_guild_if_changed(10, first["_version"]))["prefix"] == "?"
+    run(backend, check)
+
+
+def test_economy_guards(backend):
+    async def check(storage):
+        now = time.time()
+        defaults = {"balance": 100, "bank": 0, "last_daily": 0, "last_work": 0, "inventory": {}}
+        assert await storage.claim_economy(20, "last_daily", now - 86400, 200, now) is None
+        assert (await storage.create_economy(20, defaults))["balance"] == 100
+        assert (await storage.create_economy(20, dict(defaults, balance=5)))["balance"] == 100
+        assert (await storage.claim_economy(20, "last_daily", now - 86400, 200, now))["balance"] == 300
+        assert await storage.claim_economy(20, "last_daily", now - 86400, 200, now) is None
+        assert await storage.move_economy(20, "balance", "bank", 500) is None
+        assert (await storage.move_economy(20, "balance", "bank", 100))["balance"] == 300
+        assert (await storage.move_economy(20, "bank", "balance", divisor=2))["bank"] == 100
+        economy = await storage.find_economy(20)
+        assert economy["balance"] == 250 and economy["bank"] == 50
+        assert await storage.debit_economy(20, 1000) is None
+        economy = await storage.debit_economy(20, 50, "lootbox")
+        assert economy["balance"] == 200 and economy["inventory"]["lootbox"] == 1
+        assert (await storage.credit_economy(21, 25, defaults))["balance"] == 125
+        assert (await storage.credit_economy(21, 25, defaults))["balance"] == 150
+        await storage.increment_balance(21, -50)
+        assert (await storage.find_economy(21))["balance"] == 100
+    run(backend, check)
+
+
+def test_level_deltas(backend):
+    async def check(storage):
+        now = time.time()
+        await storage.apply_level_deltas([(30, 40, 10, 0, now), (31, 40, 500, 2, now)])
+        await storage.apply_level_deltas([(30, 40, 15, 0, now + 60)])
+        level = await storage.find_level(30, 40)
+        assert level["xp"] == 25 and level["last_message"] == now + 60
+        assert [entry["user_id"] for entry in await storage.find_guild_levels(40)] == [31, 30]
+        await storage.set_level(30, 40, {"xp": 1000})
+        assert (await storage.find_level(30, 40))["xp"] == 1000
+    run(backend, check)
+
+
+def test_premium(backend):
+    async def check(storage):
+        now = time.time()
+        await storage.set_premium(50, {"active": True, "expiry": now + 3600})
+        await storage.set_premium(51, {"active": True, "expiry": now - 3600})
+        assert [data["_id"] for data in await storage.find_active_premium(now)] == [50]
+        assert len(await storage.find_active_premium()) == 2
+    run(backend, check)
+
+
+def test_tickets(backend):
+    async def check(storage):
+        await storage.set_ticket("t1", {"guild_id": 60, "status": "open"})
+        await storage.set_ticket("t1", {"status": "closed"})
+        assert (await storage.find_ticket("t1"))["status"] == "closed"
+        assert [ticket["_id"] for ticket in await storage.find_guild_tickets(60, 100)] == ["t1"]
+    run(backend, check)
+
+
+def test_moderation_cases(backend):
+    async def check(storage):
+        # Cases page newest first by (timestamp, case_id)
+        for case_id, timestamp in ((1, 100.0), (2, 200.0), (3, 200.0), (4, 300.0)):
+            await storage.insert_case({"case_id": case_id, "guild_id": 70, "user_id": 80, "action": "warn", "reason": "test", "timestamp": timestamp})
+        assert (await storage.find_case(3, 70))["timestamp"] == 200.0
+        await storage.insert_cases([
+            {"case_id": case_id, "guild_id": 71, "user_id": 80, "action": "ban", "reason": "raid", "timestamp": 400.0}
+            for case_id in (1, 2, 3)
+        ])
+        assert await storage.count_user_cases(80, 71) == 3
+        page = await storage.find_user_cases(80, 70, 2)
+        assert [case["case_id"] for case in page] == [4, 3]
+        page = await storage.find_user_cases(80, 70, 2, (page[-1]["timestamp"], page[-1]["case_id"]))
+        assert [case["case_id"] for case in page] == [2, 1]
+        assert await storage.count_user_cases(80, 70) == 4
+    run(backend, check)
+
+
+def test_counters(backend):
+    async def check(storage):
+        await storage.max_counter("cases:70", 10)
+        await storage.max_counter("cases:70", 3)
+        assert await storage.increment_counter("cases:70", 5) == 15
+        assert await storage.increment_counter("cases:71", 1) == 1
+    run(backend, check)
+
+
+def test_stats(backend):
+    async def check(storage):
+        await storage.apply_stat_deltas({"commands_used": 3}, {600: {"commands_used": 2}, 660: {"commands_used": 1}})
+        await storage.apply_stat_deltas({"commands_used": 1}, {660: {"commands_used": 1}})
+        assert (await storage.find_stats())["commands_used"] == 4
+        buckets = await storage.find_stat_buckets(600, 720)
+        assert [bucket["commands_used"] for bucket in buckets] == [2, 2]
+        assert [bucket["commands_used"] for bucket in await storage.find_stat_buckets(660)] == [2]
+    run(backend, check)
+
+
+def test_guild_stats(backend):
+    async def check(storage):
+        await storage.apply_guild_stat_deltas({(80, 3600): {"messages": 2, "xp": 30}, (81, 3600): {"messages": 5}})
+        await storage.apply_guild_stat_deltas({(80, 3600): {"messages": 1}, (80, 7200): {"joins": 1}})
+        buckets = await storage.find_guild_stat_buckets(80, 0, 10800)
+        assert [(bucket.get("messages", 0), bucket.get("joins", 0)) for bucket in buckets] == [(3, 0), (0, 1)]
+        assert buckets[0]["xp"] == 30 and buckets[0]["guild_id"] == 80
+        assert len(await storage.find_guild_stat_buckets(80, 7200)) == 1
+        assert await storage.find_guild_stat_buckets(82, 0) == []
+    run(backend, check)
+
+
+def test_incomplete_backend_fails_at_construction():
+    class PartialStorage(StorageBackend):
+        async def find_user(self, user_id):
+            return None
+    with pytest.raises(TypeError):
+        PartialStorage()